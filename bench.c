@@ -0,0 +1,71 @@
+#define _POSIX_C_SOURCE 199309L
+#include <fcntl.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <time.h>
+#include <unistd.h>
+#include <sys/stat.h>
+#include <sys/types.h>
+#include <sys/mman.h>
+#include "ld32.h"
+
+
+static double now(void) {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return ts.tv_sec + ts.tv_nsec * 1e-9;
+}
+
+
+int main(int argc, char **argv) {
+    unsigned char *lengths;
+    void *addr;
+    struct stat buf;
+    double best = 0;
+    size_t n = 0;
+    int fd, i, repeat;
+
+    if (argc < 2) {
+        fprintf(stderr, "Usage: %s filename [repeat]\n", argv[0]);
+        return -1;
+    }
+    repeat = argc > 2 ? atoi(argv[2]) : 10;
+    if (repeat < 1) repeat = 1;
+
+    fd = open(argv[1], O_RDONLY);
+    if (fd < 0) {
+        perror("open");
+        return -2;
+    }
+
+    if (fstat(fd, &buf) < 0) {
+        perror("fstat");
+        return -3;
+    }
+
+    addr = mmap(NULL, buf.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+    if (addr == MAP_FAILED) {
+        perror("mmap");
+        return -4;
+    }
+
+    lengths = malloc(buf.st_size);
+    if (!lengths) {
+        perror("malloc");
+        return -5;
+    }
+
+    /* best of repeat linear sweeps, the first one faulting everything in */
+    for (i = 0; i <= repeat; i++) {
+        double t = now();
+        n = length_disasm_buf(addr, buf.st_size, lengths);
+        t = now() - t;
+        if (i == 1 || (i > 1 && t < best)) best = t;
+    }
+
+    printf("%lu instructions %lu bytes %.3f ms %.2f ns/insn %.1f MB/s\n",
+           (unsigned long)n, (unsigned long)buf.st_size, best * 1e3,
+           best * 1e9 / n, buf.st_size / best / 1e6);
+
+    return 0;
+}
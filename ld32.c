@@ -16,6 +16,14 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 */
 
+#ifdef LD32_THREADS
+#define _POSIX_C_SOURCE 200112L
+#include <pthread.h>
+#include <stdlib.h>
+#endif
+#include <stddef.h>
+#include <string.h>
+
 
 /* implemented tables */
 #define PREFIX_T (1 << 0)
@@ -25,6 +33,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #define DATA2_T  (1 << 4)
 #define DATA66_T (1 << 5)
 #define DATA12_T (1 << 6)
+#define PACKED_T (1 << 7)
 
 
 /* configure tables */
@@ -34,7 +43,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
 /* table macros */
-#ifdef USE_T
+#if defined(USE_T) && (USE_T & ~PACKED_T) && !(USE_T & PACKED_T)
 #define BITMASK32(                                          \
     b00, b01, b02, b03, b04, b05, b06, b07,                 \
     b08, b09, b0a, b0b, b0c, b0d, b0e, b0f,                 \
@@ -56,8 +65,118 @@ static int CHECK_TABLE(const unsigned int t[8], unsigned char v) {
 #endif
 
 
+/* tables generated from x86gen.py (make ld32_tables.h) */
+#ifdef LD32_TABLES
+#include "ld32_tables.h"
+#endif
+
+
+/* packed opcode classes - every check on an opcode answered by one byte, for
+ * the one byte opcodes followed by the opcodes after 0x0f (PACKED_T replaces
+ * all of the other tables) */
+#if defined(USE_T) && (USE_T & PACKED_T)
+#define MODRM_C  (1 << 0)
+#define DATA1_C  (1 << 1)
+#define DATA66_C (1 << 2)
+#define DATA2_C  (1 << 3)
+#define TEST_C   (1 << 4)
+#define MEM67_C  (1 << 5)
+#define PREFIX_C (1 << 6)
+#define CRDR_C   (1 << 6)
+#define OP3_C    (1 << 7)
+#ifndef LD32_TABLES
+static const unsigned char class_t[] = {
+    /* 0     1     2     3     4     5     6     7 */
+    0x01, 0x01, 0x01, 0x01, 0x02, 0x04, 0x00, 0x00, /* 00 */
+    0x01, 0x01, 0x01, 0x01, 0x02, 0x04, 0x00, 0x00, /* 08 */
+    0x01, 0x01, 0x01, 0x01, 0x02, 0x04, 0x00, 0x00, /* 10 */
+    0x01, 0x01, 0x01, 0x01, 0x02, 0x04, 0x00, 0x00, /* 18 */
+    0x01, 0x01, 0x01, 0x01, 0x02, 0x04, 0x40, 0x00, /* 20 */
+    0x01, 0x01, 0x01, 0x01, 0x02, 0x04, 0x40, 0x00, /* 28 */
+    0x01, 0x01, 0x01, 0x01, 0x02, 0x04, 0x40, 0x00, /* 30 */
+    0x01, 0x01, 0x01, 0x01, 0x02, 0x04, 0x40, 0x00, /* 38 */
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, /* 40 */
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, /* 48 */
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, /* 50 */
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, /* 58 */
+    0x00, 0x00, 0x01, 0x01, 0x40, 0x40, 0x40, 0x40, /* 60 */
+    0x04, 0x05, 0x02, 0x03, 0x00, 0x00, 0x00, 0x00, /* 68 */
+    0x02, 0x02, 0x02, 0x02, 0x02, 0x02, 0x02, 0x02, /* 70 */
+    0x02, 0x02, 0x02, 0x02, 0x02, 0x02, 0x02, 0x02, /* 78 */
+    0x03, 0x05, 0x03, 0x03, 0x01, 0x01, 0x01, 0x01, /* 80 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* 88 */
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, /* 90 */
+    0x00, 0x00, 0x0c, 0x00, 0x00, 0x00, 0x00, 0x00, /* 98 */
+    0x20, 0x20, 0x20, 0x20, 0x00, 0x00, 0x00, 0x00, /* a0 */
+    0x02, 0x04, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, /* a8 */
+    0x02, 0x02, 0x02, 0x02, 0x02, 0x02, 0x02, 0x02, /* b0 */
+    0x04, 0x04, 0x04, 0x04, 0x04, 0x04, 0x04, 0x04, /* b8 */
+    0x03, 0x03, 0x08, 0x00, 0x01, 0x01, 0x03, 0x05, /* c0 */
+    0x0a, 0x00, 0x08, 0x00, 0x00, 0x02, 0x00, 0x00, /* c8 */
+    0x01, 0x01, 0x01, 0x01, 0x02, 0x02, 0x00, 0x00, /* d0 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* d8 */
+    0x02, 0x02, 0x02, 0x02, 0x02, 0x02, 0x02, 0x02, /* e0 */
+    0x04, 0x04, 0x0c, 0x02, 0x00, 0x00, 0x00, 0x00, /* e8 */
+    0x40, 0x00, 0x40, 0x40, 0x00, 0x00, 0x11, 0x11, /* f0 */
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x01, 0x01, /* f8 */
+    /* 0f map */
+    0x01, 0x01, 0x01, 0x01, 0x00, 0x00, 0x00, 0x00, /* 00 */
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00, /* 08 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* 10 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* 18 */
+    0x41, 0x41, 0x41, 0x41, 0x00, 0x00, 0x00, 0x00, /* 20 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* 28 */
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, /* 30 */
+    0x81, 0x00, 0x83, 0x00, 0x00, 0x00, 0x00, 0x00, /* 38 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* 40 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* 48 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* 50 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* 58 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* 60 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* 68 */
+    0x03, 0x03, 0x03, 0x03, 0x01, 0x01, 0x01, 0x00, /* 70 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* 78 */
+    0x04, 0x04, 0x04, 0x04, 0x04, 0x04, 0x04, 0x04, /* 80 */
+    0x04, 0x04, 0x04, 0x04, 0x04, 0x04, 0x04, 0x04, /* 88 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* 90 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* 98 */
+    0x00, 0x00, 0x00, 0x01, 0x03, 0x01, 0x00, 0x00, /* a0 */
+    0x00, 0x00, 0x00, 0x01, 0x03, 0x01, 0x01, 0x01, /* a8 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* b0 */
+    0x01, 0x00, 0x03, 0x01, 0x01, 0x01, 0x01, 0x01, /* b8 */
+    0x01, 0x01, 0x03, 0x01, 0x03, 0x03, 0x03, 0x01, /* c0 */
+    0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, /* c8 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* d0 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* d8 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* e0 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* e8 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, /* f0 */
+    0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x01, 0x00  /* f8 */
+};
+#endif
+#define CLASS(v)  class_t[v]
+#define CLASS2(v) class_t[0x100 | (v)]
+#define CHECK_PREFIX(v)    (CLASS(v) & PREFIX_C)
+#define CHECK_PREFIX_66(v) ((v) == 0x66)
+#define CHECK_PREFIX_67(v) ((v) == 0x67)
+#define CHECK_0F(v)        ((v) == 0x0f)
+#define CHECK_MODRM2(v)    (CLASS2(v) & MODRM_C)
+#define CHECK_DATA12(v)    (CLASS2(v) & DATA1_C)
+#define CHECK_DATA662(v)   (CLASS2(v) & DATA66_C)
+#define CHECK_CRDR2(v)     (CLASS2(v) & CRDR_C)
+#define CHECK_OP3(v)       (CLASS2(v) & OP3_C)
+#define CHECK_MODRM(v)     (CLASS(v) & MODRM_C)
+#define CHECK_TEST(v)      (CLASS(v) & TEST_C)
+#define CHECK_DATA1(v)     (CLASS(v) & DATA1_C)
+#define CHECK_DATA2(v)     (CLASS(v) & DATA2_C)
+#define CHECK_DATA66(v)    (CLASS(v) & DATA66_C)
+#define CHECK_MEM67(v)     (CLASS(v) & MEM67_C)
+#else
+
+
 /* CHECK_PREFIX */
 #if defined(USE_T) && (USE_T & PREFIX_T)
+#ifndef LD32_TABLES
 static const unsigned int prefix_t[] = {
            /* 0 1 2 3 4 5 6 7  8 9 a b c d e f */
     BITMASK32(0,0,0,0,0,0,0,0, 0,0,0,0,0,0,0,0,  /* 0 */
@@ -77,6 +196,7 @@ static const unsigned int prefix_t[] = {
     BITMASK32(0,0,0,0,0,0,0,0, 0,0,0,0,0,0,0,0,  /* e */
               1,0,1,1,0,0,0,0, 0,0,0,0,0,0,0,0)  /* f */
 };
+#endif
 #define CHECK_PREFIX(v) CHECK_TABLE(prefix_t, v)
 #else
 static int CHECK_PREFIX(unsigned char v) {
@@ -109,6 +229,7 @@ static int CHECK_0F(unsigned char v) {
 
 /* CHECK_MODRM2 */
 #if defined(USE_T) && (USE_T & MODRM2_T)
+#ifndef LD32_TABLES
 static const unsigned int modrm2_t[] = {
            /* 0 1 2 3 4 5 6 7  8 9 a b c d e f */
     BITMASK32(1,1,1,1,0,0,0,0, 0,0,0,0,0,1,0,0,  /* 0 */
@@ -128,6 +249,7 @@ static const unsigned int modrm2_t[] = {
     BITMASK32(1,1,1,1,1,1,1,1, 1,1,1,1,1,1,1,1,  /* e */
               1,1,1,1,1,1,1,1, 1,1,1,1,1,1,1,0)  /* f */
 };
+#endif
 #define CHECK_MODRM2(v) CHECK_TABLE(modrm2_t, v)
 #else
 /* TODO: Fix this */
@@ -151,6 +273,7 @@ static int CHECK_MODRM2(unsigned char v) {
 
 /* CHECK_DATA12 */
 #if defined(USE_T) && (USE_T & DATA12_T)
+#ifndef LD32_TABLES
 static const unsigned int data12_t[] = {
            /* 0 1 2 3 4 5 6 7  8 9 a b c d e f */
     BITMASK32(0,0,0,0,0,0,0,0, 0,0,0,0,0,0,0,0,  /* 0 */
@@ -170,6 +293,7 @@ static const unsigned int data12_t[] = {
     BITMASK32(0,0,0,0,0,0,0,0, 0,0,0,0,0,0,0,0,  /* e */
               0,0,0,0,0,0,0,0, 0,0,0,0,0,0,0,0)  /* f */
 };
+#endif
 #define CHECK_DATA12(v) CHECK_TABLE(data12_t, v)
 #else
 static int CHECK_DATA12(unsigned char v) {
@@ -207,6 +331,7 @@ static int CHECK_OP3(unsigned char v) {
 
 /* CHECK_MODRM */
 #if defined(USE_T) && (USE_T & MODRM_T)
+#ifndef LD32_TABLES
 static const unsigned int modrm_t[] = {
            /* 0 1 2 3 4 5 6 7  8 9 a b c d e f */
     BITMASK32(1,1,1,1,0,0,0,0, 1,1,1,1,0,0,0,0,  /* 0 */
@@ -226,6 +351,7 @@ static const unsigned int modrm_t[] = {
     BITMASK32(0,0,0,0,0,0,0,0, 0,0,0,0,0,0,0,0,  /* e */
               0,0,0,0,0,0,1,1, 0,0,0,0,0,0,1,1)  /* f */
 };
+#endif
 #define CHECK_MODRM(v) CHECK_TABLE(modrm_t, v)
 #else
 static int CHECK_MODRM(unsigned char v) {
@@ -254,6 +380,7 @@ static int CHECK_TEST(unsigned char v) {
 
 /* CHECK_DATA1 - imm8 */
 #if defined(USE_T) && (USE_T & DATA1_T)
+#ifndef LD32_TABLES
 static const unsigned int data1_t[] = {
            /* 0 1 2 3 4 5 6 7  8 9 a b c d e f */
     BITMASK32(0,0,0,0,1,0,0,0, 0,0,0,0,1,0,0,0,  /* 0 */
@@ -273,6 +400,7 @@ static const unsigned int data1_t[] = {
     BITMASK32(1,1,1,1,1,1,1,1, 0,0,0,1,0,0,0,0,  /* e */
               0,0,0,0,0,0,0,0, 0,0,0,0,0,0,0,0)  /* f */
 };
+#endif
 #define CHECK_DATA1(v) CHECK_TABLE(data1_t, v)
 #else
 static int CHECK_DATA1(unsigned char v) {
@@ -300,6 +428,7 @@ static int CHECK_DATA1(unsigned char v) {
 /* CHECK_DATA2 - imm16 or ptr16:16/32 (the two additional bytes *must* be added
  * for this to work for both cases, and for ENTER which is imm8 and imm16 */
 #if defined(USE_T) && (USE_T & DATA2_T)
+#ifndef LD32_TABLES
 static const unsigned int data2_t[] = {
            /* 0 1 2 3 4 5 6 7  8 9 a b c d e f */
     BITMASK32(0,0,0,0,0,0,0,0, 0,0,0,0,0,0,0,0,  /* 0 */
@@ -319,6 +448,7 @@ static const unsigned int data2_t[] = {
     BITMASK32(0,0,0,0,0,0,0,0, 0,0,1,0,0,0,0,0,  /* e */
               0,0,0,0,0,0,0,0, 0,0,0,0,0,0,0,0)  /* f */
 };
+#endif
 #define CHECK_DATA2(v) CHECK_TABLE(data2_t, v)
 #else
 static int CHECK_DATA2(unsigned char v) {
@@ -329,6 +459,7 @@ static int CHECK_DATA2(unsigned char v) {
 
 /* CHECK_DATA66 */
 #if defined(USE_T) && (USE_T & DATA66_T)
+#ifndef LD32_TABLES
 static const unsigned int data66_t[] = {
            /* 0 1 2 3 4 5 6 7  8 9 a b c d e f */
     BITMASK32(0,0,0,0,0,1,0,0, 0,0,0,0,0,1,0,0,  /* 0 */
@@ -348,6 +479,7 @@ static const unsigned int data66_t[] = {
     BITMASK32(0,0,0,0,0,0,0,0, 1,1,1,0,0,0,0,0,  /* e */
               0,0,0,0,0,0,0,0, 0,0,0,0,0,0,0,0)  /* f */
 };
+#endif
 #define CHECK_DATA66(v) CHECK_TABLE(data66_t, v)
 #else
 static int CHECK_DATA66(unsigned char v) {
@@ -368,6 +500,93 @@ static int CHECK_DATA66(unsigned char v) {
 static int CHECK_MEM67(unsigned char v) {
     return (v & 0xfc) == 0xa0;
 }
+#endif /* PACKED_T */
+
+
+/* instrumentation - with LD32_STATS every CHECK_* evaluation and hit is
+ * counted per opcode byte, together with the number of prefix bytes of every
+ * instruction (the last bucket counting STAT_MAX_PREFIXES - 1 or more), and
+ * ld32_stats_dump() writes the counts as JSON. Nothing is counted while
+ * stat_paused. The counts are plain globals, and the threaded sweep decodes
+ * speculatively, so LD32_STATS cannot be combined with LD32_THREADS. */
+#ifdef LD32_STATS
+#ifdef LD32_THREADS
+#error "LD32_STATS cannot be combined with LD32_THREADS"
+#endif
+#include <stdio.h>
+
+enum {
+    S_PREFIX, S_PREFIX_66, S_PREFIX_67, S_0F,
+    S_MODRM2, S_DATA12, S_DATA662, S_CRDR2, S_OP3,
+    S_MODRM, S_DATA1, S_DATA66, S_DATA2, S_TEST, S_MEM67,
+    S_CHECKS
+};
+static const char *const stat_names[S_CHECKS] = {
+    "PREFIX", "PREFIX_66", "PREFIX_67", "0F",
+    "MODRM2", "DATA12", "DATA662", "CRDR2", "OP3",
+    "MODRM", "DATA1", "DATA66", "DATA2", "TEST", "MEM67"
+};
+
+#define STAT_MAX_PREFIXES 16
+static unsigned long stat_evaluated[S_CHECKS][256];
+static unsigned long stat_hit[S_CHECKS][256];
+static unsigned long stat_prefixes[STAT_MAX_PREFIXES];
+static int stat_paused;
+
+static int stat_check(int check, unsigned char v, int hit) {
+    if (stat_paused) return hit;
+    stat_evaluated[check][v]++;
+    if (hit) stat_hit[check][v]++;
+    return hit;
+}
+
+static void stat_prefix_count(size_t n) {
+    if (stat_paused) return;
+    stat_prefixes[n < STAT_MAX_PREFIXES ? n : STAT_MAX_PREFIXES - 1]++;
+}
+
+#define STAT(check, v) stat_check(S_##check, v, CHECK_##check(v) != 0)
+#define STAT_PREFIX_COUNT(n) stat_prefix_count(n)
+
+void ld32_stats_reset(void) {
+    memset(stat_evaluated, 0, sizeof(stat_evaluated));
+    memset(stat_hit, 0, sizeof(stat_hit));
+    memset(stat_prefixes, 0, sizeof(stat_prefixes));
+}
+
+void ld32_stats_dump(FILE *f) {
+    unsigned long insns = 0, iterations = 0;
+    int i, v, sep;
+
+    for (i = 0; i < STAT_MAX_PREFIXES; i++) insns += stat_prefixes[i];
+    for (v = 0; v < 256; v++) iterations += stat_evaluated[S_PREFIX][v];
+    fprintf(f, "{\n  \"instructions\": %lu,\n", insns);
+    fprintf(f, "  \"prefix_loop\": {\"iterations\": %lu, \"prefixes\": [",
+            iterations);
+    for (i = 0; i < STAT_MAX_PREFIXES; i++)
+        fprintf(f, "%s%lu", i ? ", " : "", stat_prefixes[i]);
+    fprintf(f, "]},\n  \"checks\": {\n");
+    for (i = 0; i < S_CHECKS; i++) {
+        unsigned long evaluated = 0, hit = 0;
+        for (v = 0; v < 256; v++) {
+            evaluated += stat_evaluated[i][v];
+            hit += stat_hit[i][v];
+        }
+        fprintf(f, "    \"%s\": {\"evaluated\": %lu, \"hit\": %lu, "
+                "\"opcodes\": {", stat_names[i], evaluated, hit);
+        for (v = 0, sep = 0; v < 256; v++) {
+            if (!stat_evaluated[i][v]) continue;
+            fprintf(f, "%s\"%02x\": [%lu, %lu]", sep++ ? ", " : "", v,
+                    stat_evaluated[i][v], stat_hit[i][v]);
+        }
+        fprintf(f, "}}%s\n", i < S_CHECKS - 1 ? "," : "");
+    }
+    fprintf(f, "  }\n}\n");
+}
+#else
+#define STAT(check, v) CHECK_##check(v)
+#define STAT_PREFIX_COUNT(n)
+#endif
 
 
 /* length_disasm */
@@ -381,28 +600,29 @@ unsigned int length_disasm(const void *opcode0) {
     /* prefix */
     do {
         op = *opcode++;
-        if (CHECK_PREFIX_66(op)) ddef = 2;
-        if (CHECK_PREFIX_67(op)) mdef = 2;
-    } while (CHECK_PREFIX(op));
+        if (STAT(PREFIX_66, op)) ddef = 2;
+        if (STAT(PREFIX_67, op)) mdef = 2;
+    } while (STAT(PREFIX, op));
+    STAT_PREFIX_COUNT(opcode - (const unsigned char *)opcode0 - 1);
 
     /* two byte opcode */
-    if (CHECK_0F(op)) {
+    if (STAT(0F, op)) {
         op = *opcode++;
-        if (CHECK_MODRM2(op)) flag = 1;
-        if (CHECK_DATA12(op)) dsize = 1;
-        else if (CHECK_DATA662(op)) dsize = ddef;
-        if (CHECK_CRDR2(op)) crdr = 1;
-        if (CHECK_OP3(op)) opcode++;
+        if (STAT(MODRM2, op)) flag = 1;
+        if (STAT(DATA12, op)) dsize = 1;
+        else if (STAT(DATA662, op)) dsize = ddef;
+        if (STAT(CRDR2, op)) crdr = 1;
+        if (STAT(OP3, op)) opcode++;
     }
 
     /* one byte opcode */
     else {
-        if (CHECK_MODRM(op)) flag = 1;
-        if (CHECK_DATA1(op)) dsize = 1;
-        else if (CHECK_DATA66(op)) dsize = ddef;
-        if (CHECK_DATA2(op)) dsize += 2;
-        if (CHECK_TEST(op) && !(*opcode & 0x30)) dsize += (op & 1) ? ddef : 1;
-        if (CHECK_MEM67(op)) msize = mdef;
+        if (STAT(MODRM, op)) flag = 1;
+        if (STAT(DATA1, op)) dsize = 1;
+        else if (STAT(DATA66, op)) dsize = ddef;
+        if (STAT(DATA2, op)) dsize += 2;
+        if (STAT(TEST, op) && !(*opcode & 0x30)) dsize += (op & 1) ? ddef : 1;
+        if (STAT(MEM67, op)) msize = mdef;
     }
 
     /* modrm */
@@ -426,3 +646,224 @@ unsigned int length_disasm(const void *opcode0) {
 
     return opcode - (const unsigned char *)opcode0;
 }
+
+
+/* length_padded - The length of the instruction at opcode as if the bytes at
+ * and past end were zero, without reading them. Instructions well clear of end
+ * are decoded in place, those near it from a zero padded copy of their operand
+ * size prefixes and remaining bytes, the other prefixes not changing the
+ * length. */
+#define LD32_MAX_OPCODE 16
+static unsigned int length_padded(const unsigned char *opcode,
+                                  const unsigned char *end) {
+    const unsigned char *op = opcode;
+    unsigned char copy[2 + LD32_MAX_OPCODE];
+    unsigned int n = 0, i;
+
+    /* prefix */
+    while (op < end && CHECK_PREFIX(*op)) op++;
+    if (end - op >= LD32_MAX_OPCODE) return length_disasm(opcode);
+
+    if (memchr(opcode, 0x66, op - opcode)) copy[n++] = 0x66;
+    if (memchr(opcode, 0x67, op - opcode)) copy[n++] = 0x67;
+    for (i = 0; n + i < sizeof(copy); i++)
+        copy[n + i] = op + i < end ? op[i] : 0;
+#ifdef LD32_STATS
+    /* count an instruction ending by end as decoded in place (which reads no
+     * byte past it), and none running past end: length_disasm_end is called
+     * for those again once more bytes are had */
+    {
+        unsigned int len;
+        stat_paused = 1;
+        len = length_disasm(copy) - n + (op - opcode);
+        stat_paused = 0;
+        if (len <= (size_t)(end - opcode)) length_disasm(opcode);
+        return len;
+    }
+#else
+    return length_disasm(copy) - n + (op - opcode);
+#endif
+}
+
+
+/* length_disasm_end - As length_disasm but without reading at or past end,
+ * returning 0 if the instruction does not end by end (more bytes are needed).
+ * Any byte length_padded reads as zero then belongs to an instruction running
+ * past end, so its value cannot matter. */
+unsigned int length_disasm_end(const void *opcode0, const void *end0) {
+    const unsigned char *opcode = opcode0, *end = end0;
+    unsigned int len = length_padded(opcode, end);
+
+    return len <= (size_t)(end - opcode) ? len : 0;
+}
+
+
+/* in_place_end - Instructions of buf starting before the returned pointer, just
+ * past the last byte that is not a prefix and is followed by at least
+ * LD32_MAX_OPCODE bytes, end in buf so can be decoded in place. */
+static const unsigned char *in_place_end(const unsigned char *buf,
+                                         const unsigned char *end) {
+    const unsigned char *safe = buf;
+
+    if (end - buf > LD32_MAX_OPCODE) {
+        safe = end - LD32_MAX_OPCODE;
+        while (safe > buf && CHECK_PREFIX(safe[-1])) safe--;
+    }
+    return safe;
+}
+
+
+/* length_disasm_buf - Linear sweep through size bytes of buf storing the
+ * length of every instruction in lengths (which must have room for size
+ * entries). Returns the number of instructions. Nothing is read past the end
+ * of buf, the last instructions being decoded as if buf were zero padded. An
+ * instruction longer than 255 bytes (more than 240 prefixes) does not fit its
+ * length byte: it is stored as 0 and ends the sweep. */
+size_t length_disasm_buf(const void *buf, size_t size, unsigned char *lengths) {
+    const unsigned char *op = buf, *end = op + size;
+    const unsigned char *safe = in_place_end(op, end);
+    size_t n = 0;
+
+    while (op < end) {
+        unsigned int len = op < safe ? length_disasm(op)
+                                     : length_padded(op, end);
+        if (len > 0xff) {
+            lengths[n++] = 0;
+            break;
+        }
+        lengths[n++] = len;
+        op += len;
+    }
+
+    return n;
+}
+
+
+/* length_disasm_buf_mt - length_disasm_buf using up to threads threads (only
+ * with LD32_THREADS). buf is split into one chunk per thread and every thread
+ * sweeps its chunk speculatively from the chunk start. The chunks are then
+ * stitched in order: from where the previous chunk's true sweep leaves off,
+ * instructions are decoded again only until they land on a start of the
+ * speculative sweep, after which the two agree. The result is identical to
+ * length_disasm_buf. Falls back to it when buf is small, the scratch buffer
+ * cannot be had, or a speculative length does not fit its byte (more than 240
+ * prefixes) so that the speculative starts cannot be followed. */
+#ifdef LD32_THREADS
+#define LD32_MIN_CHUNK 4096
+
+struct chunk {
+    const unsigned char *buf;
+    size_t size;
+    const unsigned char *safe;  /* in_place_end of buf */
+    size_t start, end;      /* bytes of buf swept by this chunk */
+    unsigned char *spec;    /* lengths of the speculative sweep */
+    size_t count;           /* number of speculative lengths */
+    size_t exit;            /* first speculative start at or after end */
+    int long_insn;          /* an instruction longer than a length byte */
+};
+
+/* length_at - The length length_disasm_buf gives the instruction at pos. */
+static unsigned int length_at(const struct chunk *c, size_t pos) {
+    const unsigned char *op = c->buf + pos;
+
+    return op < c->safe ? length_disasm(op)
+                        : length_padded(op, c->buf + c->size);
+}
+
+static void *sweep_chunk(void *arg) {
+    struct chunk *c = arg;
+    size_t pos = c->start;
+
+    c->count = 0;
+    c->long_insn = 0;
+    while (pos < c->end) {
+        unsigned int len = length_at(c, pos);
+        if (len > 0xff) c->long_insn = 1;
+        c->spec[c->count++] = len;
+        pos += len;
+    }
+    c->exit = pos;
+    return NULL;
+}
+
+size_t length_disasm_buf_mt(const void *buf, size_t size,
+                            unsigned char *lengths, unsigned int threads) {
+    struct chunk *chunks;
+    pthread_t *tids;
+    unsigned char *scratch;
+    size_t n = 0, pos = 0, step;
+    unsigned int k, started;
+
+    if (threads > size / LD32_MIN_CHUNK) threads = size / LD32_MIN_CHUNK;
+    if (threads < 2) return length_disasm_buf(buf, size, lengths);
+
+    chunks = malloc(threads * sizeof(*chunks));
+    tids = malloc(threads * sizeof(*tids));
+    scratch = malloc(size);
+    if (!chunks || !tids || !scratch) {
+        free(chunks);
+        free(tids);
+        free(scratch);
+        return length_disasm_buf(buf, size, lengths);
+    }
+
+    /* speculative sweeps, the first chunk being the true sweep */
+    step = size / threads;
+    for (k = 0; k < threads; k++) {
+        chunks[k].buf = buf;
+        chunks[k].size = size;
+        chunks[k].safe = in_place_end(chunks[k].buf, chunks[k].buf + size);
+        chunks[k].start = k * step;
+        chunks[k].end = k == threads - 1 ? size : (k + 1) * step;
+        chunks[k].spec = scratch + chunks[k].start;
+    }
+    for (started = 1; started < threads; started++)
+        if (pthread_create(&tids[started], NULL, sweep_chunk,
+                           &chunks[started]))
+            break;
+    sweep_chunk(&chunks[0]);
+    for (k = 1; k < threads; k++) {
+        if (k < started) pthread_join(tids[k], NULL);
+        else sweep_chunk(&chunks[k]);
+    }
+    for (k = 0; k < threads; k++) {
+        if (chunks[k].long_insn) {
+            n = length_disasm_buf(buf, size, lengths);
+            pos = size;
+            break;
+        }
+    }
+
+    /* stitch, pos being where the true sweep enters each chunk */
+    for (k = 0; k < threads && pos < size; k++) {
+        struct chunk *c = &chunks[k];
+        size_t spec = c->start, j = 0;
+
+        while (pos < c->end) {
+            if (pos == spec) {
+                memcpy(lengths + n, c->spec + j, c->count - j);
+                n += c->count - j;
+                pos = c->exit;
+                break;
+            }
+            if (spec < pos) {
+                spec += c->spec[j++];
+            } else {
+                unsigned int len = length_at(c, pos);
+                if (len > 0xff) {
+                    lengths[n++] = 0;
+                    pos = size;
+                    break;
+                }
+                lengths[n++] = len;
+                pos += len;
+            }
+        }
+    }
+
+    free(chunks);
+    free(tids);
+    free(scratch);
+    return n;
+}
+#endif
@@ -19,6 +19,8 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #ifndef __LD32_H__
 #define __LD32_H__
 
+#include <stddef.h>
+
 
 #ifdef __cplusplus
 extern "C" {
@@ -29,6 +31,29 @@ extern "C" {
 unsigned int length_disasm(void *opcode0);
 
 
+/* length_disasm_end */
+unsigned int length_disasm_end(const void *opcode0, const void *end);
+
+
+/* length_disasm_buf */
+size_t length_disasm_buf(const void *buf, size_t size, unsigned char *lengths);
+
+
+/* length_disasm_buf_mt, only with LD32_THREADS */
+#ifdef LD32_THREADS
+size_t length_disasm_buf_mt(const void *buf, size_t size,
+                            unsigned char *lengths, unsigned int threads);
+#endif
+
+
+/* instrumentation, only with LD32_STATS */
+#ifdef LD32_STATS
+#include <stdio.h>
+void ld32_stats_reset(void);
+void ld32_stats_dump(FILE *f);
+#endif
+
+
 #ifdef __cplusplus
 }
 #endif
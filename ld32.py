@@ -0,0 +1,361 @@
+'''x86 Length Disassembler in Python.
+
+A port of length_disasm() from ld32.c. The bitmap tables (prefix_t, modrm_t,
+modrm2_t, data1_t, data66_t, data12_t and data2_t) are read from ld32.c itself
+so the two implementations cannot drift apart.
+
+length_disasm() decodes a single instruction in pure Python. With numpy
+available, lengths() decodes a whole buffer: the length of the instruction
+starting at *every* offset is computed with vectorized table lookups, after
+which the linear sweep only has to follow the precomputed lengths.
+
+When libld32.so has been built (make libld32.so) length_disasm_buf() runs the
+linear sweep natively, reading any buffer protocol object in place and
+releasing the GIL while it runs.'''
+
+
+import ctypes
+import os
+import re
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SOURCE = os.path.join(HERE, 'ld32.c')
+LIBRARY = os.path.join(HERE, 'libld32.so')
+
+
+def load_tables(path=SOURCE):
+    '''Read every BITMASK32 table of ld32.c as 256 bytes of 0 or 1.'''
+    with open(path) as f:
+        src = re.sub(r'/\*.*?\*/', '', f.read(), flags=re.S)
+    tables = {}
+    pattern = r'static const unsigned int (\w+)\[\] = \{(.*?)\};'
+    for name, body in re.findall(pattern, src, re.S):
+        bits = re.findall(r'\b[01]\b', body)
+        if len(bits) != 0x100:
+            raise ValueError('%s: expected 256 entries, got %d' % (
+                name, len(bits)))
+        tables[name] = bytes(int(b) for b in bits)
+    return tables
+
+
+TABLES = load_tables()
+prefix_t = TABLES['prefix_t']
+modrm2_t = TABLES['modrm2_t']
+data12_t = TABLES['data12_t']
+modrm_t = TABLES['modrm_t']
+data1_t = TABLES['data1_t']
+data2_t = TABLES['data2_t']
+data66_t = TABLES['data66_t']
+
+
+def length_disasm(buf, offset=0):
+    '''The length of the instruction at `offset` in `buf`.
+
+    Bytes past the end of `buf` read as zero.'''
+    n = len(buf)
+
+    def byte(k):
+        return buf[k] if k < n else 0
+
+    i = offset
+    flag = crdr = 0
+    msize = dsize = 0
+    ddef = mdef = 4
+
+    # prefix
+    while True:
+        op = byte(i)
+        i += 1
+        if op == 0x66:
+            ddef = 2
+        if op == 0x67:
+            mdef = 2
+        if not prefix_t[op]:
+            break
+
+    # two byte opcode
+    if op == 0x0f:
+        op = byte(i)
+        i += 1
+        if modrm2_t[op]:
+            flag = 1
+        if data12_t[op]:
+            dsize = 1
+        elif (op & 0xf0) == 0x80:
+            dsize = ddef
+        if (op & 0xfc) == 0x20:
+            crdr = 1
+        if op == 0x38 or op == 0x3a:
+            i += 1
+
+    # one byte opcode
+    else:
+        if modrm_t[op]:
+            flag = 1
+        if data1_t[op]:
+            dsize = 1
+        elif data66_t[op]:
+            dsize = ddef
+        if data2_t[op]:
+            dsize += 2
+        if (op == 0xf6 or op == 0xf7) and not (byte(i) & 0x30):
+            dsize += ddef if op & 1 else 1
+        if (op & 0xfc) == 0xa0:
+            msize = mdef
+
+    # modrm
+    if flag:
+        modrm = byte(i)
+        i += 1
+        mod = 3 if crdr else modrm >> 6
+        if mod != 3:
+            rm = modrm & 7
+            if mod == 1:
+                msize += 1
+            if mod == 2:
+                msize += mdef
+            if mdef == 2:
+                if mod == 0 and rm == 6:
+                    msize += 2
+            else:
+                if rm == 4:
+                    rm = byte(i) & 7
+                    i += 1
+                if rm == 5 and mod == 0:
+                    msize += 4
+
+    return i + msize + dsize - offset
+
+
+# opcode class flags
+MODRM = 1 << 0
+DATA1 = 1 << 1
+DATA66 = 1 << 2
+DATA2 = 1 << 3
+TEST = 1 << 4
+MEM67 = 1 << 5
+CRDR = 1 << 6
+OP3 = 1 << 7
+
+
+def opcode_classes():
+    '''The class flags of every opcode, combining all the checks made by
+    length_disasm() on an opcode byte into one lookup.
+
+    Entries 0x000-0x0ff are the one byte opcodes, entries 0x100-0x1ff the
+    opcodes following 0x0f.'''
+    classes = bytearray(0x200)
+    for v in range(0x100):
+        classes[v] = (
+            MODRM * modrm_t[v] |
+            DATA1 * data1_t[v] |
+            DATA66 * (data66_t[v] and not data1_t[v]) |
+            DATA2 * data2_t[v] |
+            TEST * (v in (0xf6, 0xf7)) |
+            MEM67 * ((v & 0xfc) == 0xa0)
+        )
+        classes[0x100 + v] = (
+            MODRM * modrm2_t[v] |
+            DATA1 * data12_t[v] |
+            DATA66 * ((v & 0xf0) == 0x80 and not data12_t[v]) |
+            CRDR * ((v & 0xfc) == 0x20) |
+            OP3 * (v in (0x38, 0x3a))
+        )
+    return bytes(classes)
+
+
+CLASSES = opcode_classes()
+
+# the bytes a window needs past its offsets: enough to decode any instruction
+# or, where the prefixes run further, to tell it is longer than 255 bytes
+MARGIN = 0x100 + 32
+
+
+def _lengths_at(b, n):
+    '''The lengths at the first `n` offsets of the window `b`, or 0 where the
+    length does not fit a byte. The window must hold at least MARGIN bytes past
+    the offsets.'''
+    u8 = numpy.uint8
+    pos = numpy.arange(n)
+
+    # prefix: the first non prefix byte at or after every offset, and whether
+    # a 0x66 or 0x67 occurs before it
+    first = numpy.arange(len(b))
+    first[numpy.frombuffer(prefix_t, u8).astype(bool)[b]] = len(b)
+    first = numpy.minimum.accumulate(first[::-1])[::-1][:n]
+    far = first >= len(b) - 8
+    first[far] = pos[far]
+    seen = numpy.zeros(len(b) + 1, numpy.int64)
+    numpy.cumsum(b == 0x66, out=seen[1:])
+    ddef = u8(4) - u8(2) * (seen[first] > seen[:n])
+    numpy.cumsum(b == 0x67, out=seen[1:])
+    mdef = u8(4) - u8(2) * (seen[first] > seen[:n])
+
+    # opcode
+    i = first + 1
+    op = b[first].astype(numpy.uint16)
+    two = op == 0x0f
+    op[two] = 0x100 | b[i[two]].astype(numpy.uint16)
+    i += two
+    flags = numpy.frombuffer(CLASSES, u8)[op]
+
+    dsize = (flags & DATA1 != 0).astype(u8)
+    dsize += (flags & DATA66 != 0) * ddef
+    dsize += u8(2) * (flags & DATA2 != 0)
+    test = (flags & TEST != 0) & (b[i] & 0x30 == 0)
+    dsize += test * numpy.where(op & 1, ddef, u8(1))
+    msize = (flags & MEM67 != 0) * mdef
+    i += flags & OP3 != 0
+
+    # modrm
+    flag = flags & MODRM != 0
+    modrm = b[i]
+    mod = modrm >> 6
+    mod[flags & CRDR != 0] = 3
+    rm = modrm & 7
+    mem = flag & (mod != 3)
+    msize += mem * ((mod == 1) + (mod == 2) * mdef)
+    short = mdef == 2
+    msize += u8(2) * (mem & short & (mod == 0) & (rm == 6))
+    sib = mem & ~short & (rm == 4)
+    rm[sib] = b[i[sib] + 1] & 7
+    msize += u8(4) * (mem & ~short & (mod == 0) & (rm == 5))
+    i += flag
+    i += sib
+
+    i -= pos
+    lengths = i + msize + dsize
+    lengths[far | (lengths > 0xff)] = 0
+    return lengths.astype(u8)
+
+
+def lengths_at(buf, window=1 << 16):
+    '''The length of the instruction starting at every offset of `buf`.
+
+    The offsets are decoded `window` at a time with vectorized table lookups.
+    Bytes past the end of `buf` read as zero. An instruction longer than 255
+    bytes (more than 240 prefixes), whose length does not fit a byte, has
+    length 0.'''
+    if numpy is None:
+        raise ImportError('lengths_at() requires numpy')
+    b = numpy.frombuffer(buf, numpy.uint8)
+    n = len(b)
+    lengths = numpy.empty(n, numpy.uint8)
+    for start in range(0, n, window):
+        stop = min(start + window, n)
+        w = b[start:stop + MARGIN]
+        if len(w) < stop - start + MARGIN:
+            w = numpy.concatenate([w, numpy.zeros(MARGIN, numpy.uint8)])
+        lengths[start:stop] = _lengths_at(w, stop - start)
+    return lengths
+
+
+def lengths(buf):
+    '''The length of every instruction of a linear sweep through `buf`, as a
+    numpy uint8 array. Raises ValueError at an instruction longer than 255
+    bytes, as length_disasm_buf().'''
+    at = lengths_at(buf).tobytes()
+    n = len(at)
+    out = bytearray()
+    i = 0
+    while i < n:
+        length = at[i]
+        if not length:
+            raise ValueError(
+                'instruction at offset %d is longer than 255 bytes' % i)
+        out.append(length)
+        i += length
+    return numpy.frombuffer(bytes(out), numpy.uint8)
+
+
+class Py_buffer(ctypes.Structure):
+    _fields_ = [
+        ('buf', ctypes.c_void_p),
+        ('obj', ctypes.c_void_p),
+        ('len', ctypes.c_ssize_t),
+        ('itemsize', ctypes.c_ssize_t),
+        ('readonly', ctypes.c_int),
+        ('ndim', ctypes.c_int),
+        ('format', ctypes.c_char_p),
+        ('shape', ctypes.c_void_p),
+        ('strides', ctypes.c_void_p),
+        ('suboffsets', ctypes.c_void_p),
+        ('internal', ctypes.c_void_p),
+    ]
+
+
+PyBUF_SIMPLE = 0
+_get_buffer = ctypes.pythonapi.PyObject_GetBuffer
+_get_buffer.argtypes = [
+    ctypes.py_object, ctypes.POINTER(Py_buffer), ctypes.c_int]
+_get_buffer.restype = ctypes.c_int
+_release_buffer = ctypes.pythonapi.PyBuffer_Release
+_release_buffer.argtypes = [ctypes.POINTER(Py_buffer)]
+_release_buffer.restype = None
+
+
+def load_library(path=LIBRARY):
+    '''Load the native library, or return None if it hasn't been built.'''
+    try:
+        lib = ctypes.CDLL(path)
+    except OSError:
+        return None
+    lib.length_disasm_buf.argtypes = [
+        ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p]
+    lib.length_disasm_buf.restype = ctypes.c_size_t
+    lib.length_disasm.argtypes = [ctypes.c_void_p]
+    lib.length_disasm.restype = ctypes.c_uint
+    lib.length_disasm_end.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+    lib.length_disasm_end.restype = ctypes.c_uint
+    try:
+        mt = lib.length_disasm_buf_mt
+    except AttributeError:
+        pass  # built without LD32_THREADS
+    else:
+        mt.argtypes = [
+            ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p, ctypes.c_uint]
+        mt.restype = ctypes.c_size_t
+    return lib
+
+
+LIB = load_library()
+
+
+def length_disasm_buf(buf, threads=1):
+    '''The length of every instruction of a linear sweep through `buf`, as a
+    bytearray, using the native library.
+
+    `buf` may be any contiguous buffer protocol object (bytes, bytearray,
+    memoryview, mmap, numpy array, ...) and is not copied. The GIL is released
+    while decoding. With `threads` > 1 the sweep is split between that many
+    threads (if the library was built with LD32_THREADS), giving the same
+    lengths. Raises ValueError at an instruction longer than 255 bytes (more
+    than 240 prefixes), whose length does not fit a byte.'''
+    if LIB is None:
+        raise OSError('%s not found (make libld32.so)' % LIBRARY)
+    view = Py_buffer()
+    _get_buffer(buf, view, PyBUF_SIMPLE)
+    try:
+        lengths = bytearray(view.len)
+        if view.len:
+            out = (ctypes.c_char * view.len).from_buffer(lengths)
+            if threads > 1 and hasattr(LIB, 'length_disasm_buf_mt'):
+                n = LIB.length_disasm_buf_mt(view.buf, view.len, out, threads)
+            else:
+                n = LIB.length_disasm_buf(view.buf, view.len, out)
+            del out
+        else:
+            n = 0
+    finally:
+        _release_buffer(view)
+    del lengths[n:]
+    if n and not lengths[-1]:
+        raise ValueError('instruction at offset %d is longer than 255 bytes'
+                         % sum(lengths))
+    return lengths
@@ -1,5 +1,7 @@
 #include <fcntl.h>
 #include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
 #include <unistd.h>
 #include <sys/stat.h>
 #include <sys/types.h>
@@ -7,21 +9,159 @@
 #include "ld32.h"
 
 
-int main(int argc, char **argv) {
-    void *addr, *op;
-    struct stat buf;
-    int fd;
+/* default chunk size of the streaming scanner */
+#define CHUNK (1 << 16)
 
-    if (argc < 2) {
-        fprintf(stderr, "Usage: %s filename\n", argv[0]);
-        return -1;
+/* zero padding after the last, truncated, instruction of a stream */
+#define PAD 32
+
+
+/* output block of the binary formats */
+static unsigned char out[1 << 16];
+static size_t out_pos;
+
+/* offset of the next instruction, as two 32 bit halves */
+static unsigned long offset_lo, offset_hi;
+
+/* bits of the incomplete last byte of the bitmap */
+static unsigned char bitmap_byte;
+
+/* length histogram (the last bucket counting lengths over 255) and FNV-1a hash
+ * of the lengths for the summary */
+#define LONG_LENGTH 256
+static unsigned long histogram[LONG_LENGTH + 1];
+static unsigned long hash = 2166136261UL;
+
+
+static void flush(void) {
+    fwrite(out, 1, out_pos, stdout);
+    out_pos = 0;
+}
+
+
+static void put_byte(unsigned char b) {
+    if (out_pos == sizeof(out)) flush();
+    out[out_pos++] = b;
+}
+
+
+/* put_word - Write v as n little endian bytes. */
+static void put_word(unsigned long v, int n) {
+    int i;
+    for (i = 0; i < n; i++, v >>= 8) put_byte(v & 0xff);
+}
+
+
+static void advance(unsigned int len) {
+    unsigned long lo = (offset_lo + len) & 0xffffffffUL;
+    if (lo < offset_lo) offset_hi++;
+    offset_lo = lo;
+}
+
+
+static void put_text(unsigned int len) {
+    printf("%d\n", len);
+}
+
+
+/* put_u8 - Write len as a byte. An instruction longer than 255 bytes is
+ * written as 0 and ends the output with an error, as in length_disasm_buf. */
+static void put_u8(unsigned int len) {
+    if (len > 0xff) {
+        put_byte(0);
+        flush();
+        fprintf(stderr, "instruction longer than 255 bytes at offset %.0f\n",
+                offset_hi * 4294967296.0 + offset_lo);
+        exit(-8);
+    }
+    put_byte(len);
+    advance(len);
+}
+
+
+static void put_u32(unsigned int len) {
+    put_word(offset_lo, 4);
+    advance(len);
+}
+
+
+static void put_u64(unsigned int len) {
+    put_word(offset_lo, 4);
+    put_word(offset_hi, 4);
+    advance(len);
+}
+
+
+/* put_bitmap - Set the bit of the instruction start at offset_lo in the
+ * current byte, writing out the bytes the instruction covers. */
+static void put_bitmap(unsigned int len) {
+    unsigned long bit = offset_lo & 7;
+
+    bitmap_byte |= 1 << bit;
+    for (bit += len; bit >= 8; bit -= 8) {
+        put_byte(bitmap_byte);
+        bitmap_byte = 0;
     }
+    advance(len);
+}
+
+
+static void hash_byte(unsigned char b) {
+    hash = ((hash ^ b) * 16777619UL) & 0xffffffffUL;
+}
 
-    fd = open(argv[1], O_RDONLY);
-    if (fd < 0) {
-        perror("open");
-        return -2;
+
+/* put_summary - Count and hash len, a length over 255 being hashed as a 0
+ * followed by its 4 little endian bytes. */
+static void put_summary(unsigned int len) {
+    unsigned long v = len;
+    int i;
+
+    if (len > 0xff) {
+        histogram[LONG_LENGTH]++;
+        hash_byte(0);
+        for (i = 0; i < 4; i++, v >>= 8) hash_byte(v & 0xff);
+    } else {
+        histogram[len]++;
+        hash_byte(len);
     }
+    advance(len);
+}
+
+
+static void summary(void) {
+    unsigned long count = 0;
+    int i;
+
+    for (i = 0; i <= LONG_LENGTH; i++) count += histogram[i];
+    printf("instructions %lu\n", count);
+    printf("bytes %.0f\n", offset_hi * 4294967296.0 + offset_lo);
+    printf("fnv1a32 0x%08lx\n", hash);
+    for (i = 0; i < LONG_LENGTH; i++)
+        if (histogram[i]) printf("length %d %lu\n", i, histogram[i]);
+    if (histogram[LONG_LENGTH])
+        printf("length >255 %lu\n", histogram[LONG_LENGTH]);
+}
+
+
+/* output formats: decimal lines, uint8 lengths, little endian uint32 or
+ * uint64 start offsets, a bitmap of the start offsets (bit i % 8 of byte i / 8
+ * set when an instruction starts at i) or a summary of the lengths */
+#define FORMATS 6
+static const char *const formats[FORMATS] = {
+    "text", "u8", "u32", "u64", "bitmap", "summary"
+};
+static void (*const putters[FORMATS])(unsigned int) = {
+    put_text, put_u8, put_u32, put_u64, put_bitmap, put_summary
+};
+static void (*put)(unsigned int) = put_text;
+
+
+/* scan_mmap - Decode a whole file mapped into memory, with LD32_THREADS in
+ * threads threads. */
+static int scan_mmap(int fd, unsigned int threads) {
+    void *addr, *op;
+    struct stat buf;
 
     if (fstat(fd, &buf) < 0) {
         perror("fstat");
@@ -34,11 +174,141 @@ int main(int argc, char **argv) {
         return -4;
     }
 
+#ifdef LD32_THREADS
+    if (threads > 1) {
+        unsigned char *lengths = malloc(buf.st_size);
+        size_t i, n;
+        if (!lengths) {
+            perror("malloc");
+            return -5;
+        }
+        n = length_disasm_buf_mt(addr, buf.st_size, lengths, threads);
+        for (i = 0; i < n && lengths[i]; i++) {
+            put(lengths[i]);
+            op += lengths[i];
+        }
+        free(lengths);
+        /* the rest from an instruction longer than 255 bytes, if any */
+    }
+#else
+    (void)threads;
+#endif
+
     while (op < addr + buf.st_size) {
         unsigned int len = length_disasm(op);
-        printf("%d\n", len);
+        put(len);
         op += len;
     }
 
     return 0;
 }
+
+
+/* scan_stream - Decode the input chunk bytes at a time in constant memory,
+ * carrying an instruction straddling the end of a chunk over to the next. */
+static int scan_stream(int fd, size_t chunk) {
+    unsigned char *buf, *op;
+    size_t avail = 0;
+    int eof = 0;
+
+    buf = malloc(chunk + PAD);
+    if (!buf) {
+        perror("malloc");
+        return -5;
+    }
+
+    while (!eof) {
+        while (avail < chunk) {
+            ssize_t n = read(fd, buf + avail, chunk - avail);
+            if (n < 0) {
+                perror("read");
+                return -6;
+            }
+            if (n == 0) {
+                eof = 1;
+                break;
+            }
+            avail += n;
+        }
+
+        op = buf;
+        for (;;) {
+            unsigned int len = length_disasm_end(op, buf + avail);
+            if (!len) break;
+            put(len);
+            op += len;
+        }
+        if (op == buf && !eof) {
+            fprintf(stderr, "instruction longer than %lu bytes\n",
+                    (unsigned long)chunk);
+            return -7;
+        }
+        avail -= op - buf;
+        memmove(buf, op, avail);
+    }
+
+    /* the input ends inside an instruction, decode it from zero padding like
+     * the rest of the last page of a mapped file */
+    if (avail) {
+        memset(buf + avail, 0, PAD);
+        put(length_disasm(buf));
+    }
+
+    free(buf);
+    return 0;
+}
+
+
+int main(int argc, char **argv) {
+    size_t chunk = CHUNK;
+    unsigned int threads = 1;
+    int i, j, fd, stream = 0, ret;
+
+    for (i = 1; i < argc - 1; i++) {
+        if (!strcmp(argv[i], "-s")) {
+            stream = 1;
+        } else if (!strcmp(argv[i], "-c") && i + 2 < argc) {
+            chunk = strtoul(argv[++i], NULL, 0);
+            stream = 1;
+        } else if (!strcmp(argv[i], "-f") && i + 2 < argc) {
+            for (j = 0; j < FORMATS && strcmp(argv[i + 1], formats[j]); j++);
+            if (j == FORMATS) break;
+            put = putters[j];
+            i++;
+#ifdef LD32_THREADS
+        } else if (!strcmp(argv[i], "-t") && i + 2 < argc) {
+            threads = strtoul(argv[++i], NULL, 0);
+#endif
+        } else {
+            break;
+        }
+    }
+
+    if (i != argc - 1 || chunk < PAD) {
+        fprintf(stderr, "Usage: %s [-s] [-c chunk] [-t threads] "
+                "[-f text|u8|u32|u64|bitmap|summary] filename|-\n", argv[0]);
+        return -1;
+    }
+
+    if (!strcmp(argv[i], "-")) {
+        fd = STDIN_FILENO;
+        stream = 1;
+    } else {
+        fd = open(argv[i], O_RDONLY);
+        if (fd < 0) {
+            perror("open");
+            return -2;
+        }
+    }
+
+    ret = stream ? scan_stream(fd, chunk) : scan_mmap(fd, threads);
+    if (put == put_summary) summary();
+    if (put == put_bitmap && offset_lo & 7) put_byte(bitmap_byte);
+    flush();
+
+#ifdef LD32_STATS
+    ld32_stats_dump(stderr);
+#endif
+
+    return ret;
+}
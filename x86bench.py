@@ -0,0 +1,168 @@
+#!/usr/bin/python3
+'''Benchmark x86gen.py.
+
+Times the generation of the full corpus and of every section, reporting
+instructions per second, MB per second and peak RSS. Every section is timed
+cold, in the first run that builds its operand Blocks, and warm, when it only
+joins their cached bytes. Results can be saved as a JSON baseline and compared
+against later runs:
+
+    ./x86bench.py --save before.json
+    ... change things ...
+    ./x86bench.py --compare before.json'''
+
+
+import argparse
+import json
+import os
+import platform
+import resource
+import time
+
+started = time.perf_counter()
+import x86gen
+imported = time.perf_counter()
+
+
+# sections quicker than this in both runs are compared on timer noise alone
+MIN_SECONDS = 1e-4
+
+
+def best(f, repeat):
+    '''The best wall clock time of `repeat` calls of `f`.'''
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - t)
+    return min(times)
+
+
+def rates(count, size, seconds):
+    return {
+        'count': count,
+        'size': size,
+        'seconds': seconds,
+        'insns_per_sec': count / seconds if seconds else 0.0,
+        'mb_per_sec': size / seconds / 1e6 if seconds else 0.0,
+    }
+
+
+def full(vectorize, times=None):
+    '''Generate every section through a Writer to /dev/null, appending the
+    time each took to `times` if given.'''
+    out = x86gen.Writer(os.open(os.devnull, os.O_WRONLY))
+    for section in x86gen.iter_sections():
+        t = time.perf_counter()
+        for form in section.forms:
+            out.write(form.tobytes(vectorize))
+        if times is not None:
+            times.append(time.perf_counter() - t)
+    out.close()
+
+
+def bench(repeat, vectorize):
+    # the first run also builds every operand Block, each section timing the
+    # Blocks it is the first to use
+    cold_times = []
+    t = time.perf_counter()
+    full(vectorize, cold_times)
+    cold = time.perf_counter() - t
+
+    count = sum(len(s) for s in x86gen.SECTIONS)
+    size = sum(s.size() for s in x86gen.SECTIONS)
+    result = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'numpy': vectorize,
+        'repeat': repeat,
+        'import': imported - started,
+        'cold': rates(count, size, cold),
+        'full': rates(count, size, best(lambda: full(vectorize), repeat)),
+        'sections': [],
+    }
+    for i, section in enumerate(x86gen.SECTIONS):
+        seconds = best(lambda: section.tobytes(vectorize), repeat)
+        entry = rates(len(section), section.size(), seconds)
+        entry.update(index=i, name=section.name, cold_seconds=cold_times[i])
+        result['sections'].append(entry)
+    # ru_maxrss is in KiB on Linux
+    result['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+
+def report(result, top):
+    print('import  %8.3f s' % result['import'])
+    for key in ('cold', 'full'):
+        r = result[key]
+        print('%-7s %8.3f s %12.0f insns/s %8.1f MB/s' % (
+            key, r['seconds'], r['insns_per_sec'], r['mb_per_sec']))
+    print('peak RSS %d KiB' % result['peak_rss_kb'])
+    print()
+    print('slowest sections (cold, building their Blocks, and warm):')
+    sections = sorted(result['sections'], key=lambda e: -e['cold_seconds'])
+    for e in sections[:top]:
+        print('%4d %8.4f s %8.4f s %12.0f insns/s %8.1f MB/s  %s' % (
+            e['index'], e['cold_seconds'], e['seconds'], e['insns_per_sec'],
+            e['mb_per_sec'], e['name']))
+
+
+def compare(result, baseline, top):
+    print('%-7s %10s %10s %8s' % ('', 'baseline', 'current', 'speedup'))
+    for key in ('cold', 'full'):
+        a, b = baseline[key]['seconds'], result[key]['seconds']
+        print('%-7s %9.3fs %9.3fs %7.2fx' % (key, a, b, a / b if b else 0))
+    print('%-7s %8dK %8dK' % (
+        'rss', baseline['peak_rss_kb'], result['peak_rss_kb']))
+    print()
+
+    # sections are compared on their cold time, the warm one only joining
+    # cached bytes
+    before = {(e['index'], e['name']): e for e in baseline['sections']}
+    changes = []
+    for e in result['sections']:
+        b = before.get((e['index'], e['name']))
+        if not (b and b.get('cold_seconds') and e['cold_seconds']):
+            continue
+        if max(b['cold_seconds'], e['cold_seconds']) >= MIN_SECONDS:
+            changes.append((b['cold_seconds'] / e['cold_seconds'], b, e))
+    changes.sort(key=lambda c: c[0])
+    print('largest section slowdowns (cold):')
+    for speedup, b, e in changes[:top]:
+        print('%4d %7.2fx  %s' % (e['index'], speedup, e['name']))
+    print('largest section speedups (cold):')
+    for speedup, b, e in changes[::-1][:top]:
+        print('%4d %7.2fx  %s' % (e['index'], speedup, e['name']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-r', '--repeat', metavar='N', type=int, default=3,
+                        help='report the best of N runs (default: 3)')
+    parser.add_argument('-n', '--numpy', action='store_true',
+                        help='use the numpy backend of x86gen')
+    parser.add_argument('-t', '--top', metavar='N', type=int, default=10,
+                        help='number of sections to list (default: 10)')
+    parser.add_argument('-s', '--save', metavar='FILE',
+                        help='save the results to FILE as JSON')
+    parser.add_argument('-c', '--compare', metavar='FILE',
+                        help='compare the results with a saved baseline')
+    args = parser.parse_args()
+
+    if args.numpy and x86gen.numpy is None:
+        parser.error('--numpy requires numpy')
+
+    result = bench(args.repeat, args.numpy)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(result, json.load(f), args.top)
+    else:
+        report(result, args.top)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(result, f, indent=1)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+'''Compare instruction boundary bitmaps.
+
+A boundary bitmap has one bit per byte of code, set where an instruction
+starts: byte i is bit i % 8 (least significant first) of byte i // 8 of the
+bitmap. x86gen.py --bitmap writes the bitmap of the corpus it generates and
+test -f bitmap that of the instructions ld32 decodes, so the two can be
+compared with word wide bit operations instead of walking lengths:
+
+    ./x86gen.py -o x86.bin --bitmap x86gen.bits
+    ./test -f bitmap x86.bin > ld32.bits
+    ./x86bitmap.py x86gen.bits ld32.bits
+
+Bitmap loads a bitmap, or builds one from lengths, and answers popcount, rank
+and select queries.'''
+
+
+import argparse
+import bisect
+import functools
+import sys
+
+
+# the bits of an instruction of each length, in byte order
+PATTERNS = ['1' + '0' * (n - 1) if n else '' for n in range(0x100)]
+
+
+def tobytes(bits):
+    '''Pack a string of '0' and '1' (a multiple of 8 long) into bytes.'''
+    if not bits:
+        return b''
+    return int(bits[::-1], 2).to_bytes(len(bits) // 8, 'little')
+
+
+def pack(lengths, carry=''):
+    '''Pack the instruction starts of `lengths` (one byte per instruction)
+    following the `carry` bits.
+
+    Returns the complete bytes and the bits of the incomplete last byte, to
+    be passed as the `carry` of the next call or padded with flush().'''
+    bits = carry + ''.join(map(PATTERNS.__getitem__, lengths))
+    n = len(bits) & ~7
+    return tobytes(bits[:n]), bits[n:]
+
+
+def flush(carry):
+    '''The last byte of a bitmap from the `carry` of pack().'''
+    return tobytes(carry.ljust(8, '0')) if carry else b''
+
+
+class Bitmap:
+    '''A boundary bitmap of `size` bits.'''
+
+    # bits per entry of the rank directory
+    BLOCK = 512
+
+    def __init__(self, data, size=None):
+        self.data = bytes(data)
+        self.size = len(self.data) * 8 if size is None else size
+
+    @classmethod
+    def from_lengths(cls, lengths):
+        data, carry = pack(lengths)
+        return cls(data + flush(carry), sum(lengths))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    @functools.cached_property
+    def bits(self):
+        return int.from_bytes(self.data, 'little')
+
+    @functools.cached_property
+    def ranks(self):
+        '''The number of starts before every BLOCK bits.'''
+        step = self.BLOCK // 8
+        ranks, n = [], 0
+        for i in range(0, len(self.data), step):
+            ranks.append(n)
+            n += int.from_bytes(self.data[i:i + step], 'little').bit_count()
+        ranks.append(n)
+        return ranks
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        '''Whether an instruction starts at byte `i`.'''
+        return self.data[i >> 3] >> (i & 7) & 1
+
+    def count(self):
+        '''The number of instruction starts (popcount).'''
+        return self.ranks[-1]
+
+    def rank(self, i):
+        '''The number of instruction starts before byte `i`.'''
+        block = i // self.BLOCK
+        start = block * self.BLOCK // 8
+        partial = self.data[start:i >> 3] + bytes(
+            [self.data[i >> 3] & ((1 << (i & 7)) - 1)] if i & 7 else [])
+        partial = int.from_bytes(partial, 'little')
+        return self.ranks[block] + partial.bit_count()
+
+    def select(self, k):
+        '''The byte at which instruction `k` (counting from 0) starts.'''
+        if not 0 <= k < self.count():
+            raise IndexError('no instruction %d' % k)
+        block = bisect.bisect_right(self.ranks, k) - 1
+        n = self.ranks[block]
+        for i in range(block * self.BLOCK // 8, len(self.data)):
+            byte = self.data[i]
+            c = byte.bit_count()
+            if n + c > k:
+                for bit in range(8):
+                    if byte >> bit & 1:
+                        if n == k:
+                            return i * 8 + bit
+                        n += 1
+            n += c
+
+    def starts(self):
+        '''Yield the byte of every instruction start.'''
+        for i, byte in enumerate(self.data):
+            while byte:
+                low = byte & -byte
+                yield i * 8 + low.bit_length() - 1
+                byte ^= low
+
+    def _combine(self, other, op):
+        n = max(len(self.data), len(other.data))
+        data = (op(self.bits, other.bits) & ((1 << 8 * n) - 1)).to_bytes(
+            n, 'little')
+        return Bitmap(data, max(self.size, other.size))
+
+    def __and__(self, other):
+        return self._combine(other, lambda a, b: a & b)
+
+    def __or__(self, other):
+        return self._combine(other, lambda a, b: a | b)
+
+    def __xor__(self, other):
+        return self._combine(other, lambda a, b: a ^ b)
+
+    def __sub__(self, other):
+        return self._combine(other, lambda a, b: a & ~b)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('expected', help='bitmap of the true boundaries')
+    parser.add_argument('actual', help='bitmap to check')
+    parser.add_argument('-n', '--examples', metavar='N', type=int, default=10,
+                        help='show the first N differences (default: 10)')
+    args = parser.parse_args()
+
+    expected = Bitmap.load(args.expected)
+    actual = Bitmap.load(args.actual)
+    missed = expected - actual
+    extra = actual - expected
+    print('%10d starts in %s' % (expected.count(), args.expected))
+    print('%10d starts in %s' % (actual.count(), args.actual))
+    print('%10d in both' % (expected & actual).count())
+    print('%10d only in %s' % (missed.count(), args.expected))
+    print('%10d only in %s' % (extra.count(), args.actual))
+
+    differences = expected ^ actual
+    for i, byte in zip(range(args.examples), differences.starts()):
+        print('  byte %d: %s' % (byte, 'missed' if missed[byte] else 'extra'))
+    sys.exit(1 if differences.count() else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+'''Check the instruction lengths of ld32 against the x86gen corpus.
+
+Every section of x86gen is generated in memory together with the known length
+of each of its instructions. The section is decoded in one batch, and only
+when the batch disagrees with the known lengths is every instruction decoded
+again from its known start to find the offending ones. Exits with status 1 if
+any length is wrong.'''
+
+
+import argparse
+import ctypes
+import functools
+import itertools
+import multiprocessing
+import sys
+import time
+
+import ld32
+import x86gen
+
+
+BACKENDS = ('native', 'numpy', 'python')
+
+
+def default_backend():
+    if ld32.LIB is not None:
+        return 'native'
+    if ld32.numpy is not None:
+        return 'numpy'
+    return 'python'
+
+
+def decode(data, starts, backend):
+    '''The ld32 length of the instruction at each of `starts` in `data`.'''
+    if backend == 'native':
+        # zero padded so that nothing is read past the end
+        buf = ctypes.create_string_buffer(bytes(data), len(data) + 32)
+        base = ctypes.addressof(buf)
+        return bytes(ld32.LIB.length_disasm(base + s) for s in starts)
+    if backend == 'numpy':
+        return bytes(ld32.lengths_at(data)[starts])
+    return bytes(ld32.length_disasm(data, s) for s in starts)
+
+
+def check(shard, backend, limit):
+    '''Check the sections SECTIONS[start:stop] of a (start, stop) shard.
+
+    Returns a (count, size, mismatches, examples) tuple per section, examples
+    being at most `limit` (ordinal, bytes, expected, actual) tuples.'''
+    start, stop = shard
+    results = []
+    for section in x86gen.SECTIONS[start:stop]:
+        data = section.tobytes()
+        expected = section.lengths()
+        if backend == 'native':
+            ok = ld32.length_disasm_buf(data) == expected
+        elif backend == 'numpy':
+            ok = ld32.lengths(data).tobytes() == expected
+        else:
+            ok = False
+        mismatches, examples = 0, []
+        if not ok:
+            starts = list(itertools.accumulate(expected, initial=0))[:-1]
+            actual = decode(data, starts, backend)
+            for i, (e, a) in enumerate(zip(expected, actual)):
+                if e != a:
+                    mismatches += 1
+                    if len(examples) < limit:
+                        insn = data[starts[i]:starts[i] + e]
+                        examples.append((i, insn, e, a))
+        results.append((len(expected), len(data), mismatches, examples))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-B', '--backend', choices=BACKENDS,
+                        default=default_backend(),
+                        help='ld32 implementation to check (default: %s)' %
+                        default_backend())
+    parser.add_argument('-j', '--jobs', metavar='N', type=int, default=1,
+                        help='check sections in N worker processes')
+    parser.add_argument('-n', '--examples', metavar='N', type=int, default=10,
+                        help='show the first N offending instructions '
+                        '(default: 10)')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='list every section, not just failing ones')
+    args = parser.parse_args()
+
+    if args.backend == 'native' and ld32.LIB is None:
+        parser.error('--backend native requires %s' % ld32.LIBRARY)
+    if args.backend == 'numpy' and ld32.numpy is None:
+        parser.error('--backend numpy requires numpy')
+
+    started = time.perf_counter()
+    work = functools.partial(check, backend=args.backend, limit=args.examples)
+    if args.jobs > 1:
+        pool = multiprocessing.Pool(args.jobs)
+        results = pool.imap(work, x86gen.shards(args.jobs * 4))
+    else:
+        pool = None
+        results = (work((i, i + 1)) for i in range(len(x86gen.SECTIONS)))
+
+    count = size = mismatches = 0
+    examples = []
+    print('%8s %10s  %s' % ('count', 'mismatches', 'section'))
+    sections = x86gen.iter_sections()
+    for result in results:
+        for (n, s, m, e), section in zip(result, sections):
+            count += n
+            size += s
+            mismatches += m
+            if m or args.verbose:
+                print('%8d %10d  %s' % (n, m, section.name))
+            for i, insn, expected, actual in e:
+                if len(examples) < args.examples:
+                    examples.append((section.name, i, insn, expected, actual))
+    if pool:
+        pool.close()
+        pool.join()
+    elapsed = time.perf_counter() - started
+
+    if examples:
+        print()
+        print('first offending instructions:')
+        for name, i, insn, expected, actual in examples:
+            print('  %-24s expected %2d got %2d  (%s #%d)' % (
+                insn.hex(' '), expected, actual, name, i))
+    print()
+    print('checked %d instructions (%.1f MB) with the %s backend in %.2fs '
+          '(%.1fM insns/s): %d mismatches' % (
+              count, size / 1e6, args.backend, elapsed,
+              count / elapsed / 1e6, mismatches))
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,21 +7,498 @@ emitted. I hope to make this behaviour optional at some point.
 
 Where adding a prefix doesn't have any effect on an instruction, a best effort
 attempt has been made to not emit the extra instruction, however, removing all
-instances of useless instruction repetition will be an ongoing task.'''
+instances of useless instruction repetition will be an ongoing task. With
+--dedup the forms that only add prefixes length decoding ignores (e.g. the
+0xf2/0xf3 variants of the SSE opcodes) to another form are left out.
+
+Importing this module has no side effects other than building the (small)
+description of the instruction space, which can then be consumed in-process:
+
+    import x86gen
+    for insn in x86gen.iter_instructions():
+        ...'''
+
+
+import argparse
+import bisect
+import collections
+import functools
+import json
+import mmap
+import multiprocessing
+import os
+import random
+import sys
 
+import x86bitmap
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Writer:
+    '''Buffered bulk writer.
+
+    Output is collected in a single preallocated buffer and handed to the
+    file descriptor in `size` byte blocks, so the number of write syscalls
+    is proportional to the corpus size rather than the instruction count.'''
+
+    def __init__(self, fd, size=1 << 20):
+        self.fd = fd
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+        self.pos = 0
+
+    def _write(self, b):
+        view = memoryview(b)
+        while view:
+            view = view[os.write(self.fd, view):]
+
+    def write(self, b):
+        n = len(b)
+        if self.pos + n > len(self.buf):
+            self.flush()
+            if n >= len(self.buf):
+                self._write(b)
+                return
+        self.view[self.pos:self.pos + n] = b
+        self.pos += n
+
+    def flush(self):
+        if self.pos:
+            self._write(self.view[:self.pos])
+            self.pos = 0
+
+    def close(self):
+        self.flush()
+        if self.fd > 2:
+            os.close(self.fd)
+
+
+class MmapWriter:
+    '''Writer into a file preallocated to its final `size`.
+
+    The file is mapped into memory and written in place, so the output is
+    copied straight into the page cache without any intermediate buffer.'''
+
+    def __init__(self, fd, size):
+        os.ftruncate(fd, size)
+        self.fd = fd
+        self.map = mmap.mmap(fd, size) if size else None
+        self.pos = 0
+
+    def write(self, b):
+        n = len(b)
+        if not n:
+            return  # also when size is 0 and nothing is mapped
+        self.map[self.pos:self.pos + n] = b
+        self.pos += n
+
+    def flush(self):
+        if self.map is not None:
+            self.map.flush()
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        os.close(self.fd)
+
+
+class Block:
+    '''A set of operand byte sequences (e.g. every ModRM/SIB form).
+
+    The number of operands and their total size are known up front. The
+    operands themselves are only generated when first needed, as the list
+    `operands`, which Form.tobytes() joins. `data`, the operands back to
+    back, only backs the numpy `matrix`, and `lengths` holds their lengths.
+
+    `key` is the (generator name, modonly, regonly) the operands were built
+    from, if any, see covers(). `index(i)`, if given, builds operand `i` on
+    its own.'''
+
+    def __init__(self, generate, count, size, key=None, index=None):
+        self.generate = generate
+        self.count = count
+        self.size = size
+        self.key = key
+        self.index = index
+
+    @functools.cached_property
+    def operands(self):
+        return [bytes(o) for o in self.generate()]
+
+    @functools.cached_property
+    def data(self):
+        return b''.join(self.operands)
+
+    @functools.cached_property
+    def lengths(self):
+        return bytes(len(o) for o in self.operands)
+
+    @functools.cached_property
+    def matrix(self):
+        '''The operands as a zero padded (count, width) numpy array and the
+        mask of its valid bytes.'''
+        lengths = numpy.frombuffer(self.lengths, numpy.uint8)
+        width = int(lengths.max()) if len(lengths) else 0
+        mask = numpy.arange(width) < lengths[:, None]
+        matrix = numpy.zeros(mask.shape, numpy.uint8)
+        matrix[mask] = numpy.frombuffer(self.data, numpy.uint8)
+        return matrix, mask
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.operands)
+
+    def __getitem__(self, i):
+        '''Operand `i`, without generating the others if they aren't yet.'''
+        if self.index is None or 'operands' in self.__dict__:
+            return self.operands[i]
+        return bytes(self.index(i))
+
+    @functools.cached_property
+    def reduced(self):
+        '''The Block of the first operand of every length class, see
+        LENGTH_CLASSES, or the Block itself if its operands have none.'''
+        if self.key is None or self.key[0] not in LENGTH_CLASSES:
+            return self
+        length_class = LENGTH_CLASSES[self.key[0]]
+        classes = {}
+        for o in self.generate():
+            classes.setdefault(length_class(o), bytes(o))
+        operands = list(classes.values())
+        return Block(lambda: operands, len(operands), sum(map(len, operands)),
+                     self.key)
+
+    def covers(self, other):
+        '''Whether every operand of `other` is one of this Block's.'''
+        if self is other:
+            return True
+        if self.key is None or other.key is None:
+            return False
+        if self.key[0] != other.key[0]:
+            return False
+        return all(
+            mine is None or (theirs is not None and set(theirs) <= set(mine))
+            for mine, theirs in zip(self.key[1:], other.key[1:])
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def _add(n):
+    '''A bytes.translate() table adding `n` to every byte.'''
+    return bytes((i + n) & 0xff for i in range(0x100))
+
+
+# operand set of a form without any variable operand
+NONE = Block(lambda: [b''], 1, 0)
+
+
+class Form:
+    '''The instructions `head` + operand + `tail` for each operand in
+    `block`.'''
+
+    def __init__(self, head, block, tail):
+        self.head = head
+        self.block = block
+        self.tail = tail
+
+    def __len__(self):
+        return len(self.block)
+
+    def __iter__(self):
+        head, tail = self.head, self.tail
+        for o in self.block.operands:
+            yield head + o + tail
+
+    def tobytes(self, vectorize=False):
+        if vectorize:
+            return self.array().tobytes()
+        head, tail = self.head, self.tail
+        return head + (tail + head).join(self.block.operands) + tail
+
+    def array(self):
+        '''The instructions as a flat numpy uint8 array.
+
+        Every instruction is laid out as a fixed width row of head, padded
+        operand and tail, then the padding is dropped with a single mask.'''
+        operands, valid = self.block.matrix
+        n, width = operands.shape
+        h, t = len(self.head), len(self.tail)
+        rows = numpy.empty((n, h + width + t), numpy.uint8)
+        rows[:, :h] = numpy.frombuffer(self.head, numpy.uint8)
+        rows[:, h:h + width] = operands
+        rows[:, h + width:] = numpy.frombuffer(self.tail, numpy.uint8)
+        mask = numpy.ones(rows.shape, bool)
+        mask[:, h:h + width] = valid
+        return rows[mask]
+
+    def lengths(self):
+        '''The length of each instruction as one byte per instruction.'''
+        n = len(self.head) + len(self.tail)
+        return self.block.lengths.translate(_add(n))
+
+    def size(self):
+        '''The total number of bytes of all the instructions.'''
+        n = len(self.head) + len(self.tail)
+        return n * len(self.block) + self.block.size
+
+    def opcode(self):
+        '''The opcode bytes (including any 0x0f escapes) of the form.'''
+        head = self.head.lstrip(PREFIXES)
+        if head[:1] == b'\x0f':
+            return head[:3] if head[1:2] in (b'\x38', b'\x3a') else head[:2]
+        return head[:1]
+
+    def prefixes(self):
+        '''The legacy prefix bytes of the form.'''
+        return self.head[:len(self.head) - len(self.head.lstrip(PREFIXES))]
+
+    def decode_key(self):
+        '''What length_disasm() decodes differently between forms: the
+        operand and address size prefixes, in any order, and everything but
+        the prefixes and the operand. The other prefixes only go through the
+        prefix loop, whatever they mean to the instruction.'''
+        prefixes = self.prefixes()
+        return (pos in prefixes, pas in prefixes,
+                self.head[len(prefixes):], self.tail)
+
+
+class Section:
+    '''A named group of forms, one per commented block of the generator.'''
 
-import sys
+    def __init__(self, name):
+        self.name = name
+        self.forms = []
+
+    def __len__(self):
+        return sum(len(f) for f in self.forms)
+
+    def __iter__(self):
+        for f in self.forms:
+            yield from f
+
+    def tobytes(self, vectorize=False):
+        return b''.join(f.tobytes(vectorize) for f in self.forms)
+
+    def lengths(self):
+        return b''.join(f.lengths() for f in self.forms)
+
+    def size(self):
+        return sum(f.size() for f in self.forms)
+
+    def opcodes(self):
+        '''The distinct opcodes of the section in order of appearance.'''
+        return list(dict.fromkeys(f.opcode() for f in self.forms))
+
+
+SECTIONS = []
+
+
+def S(name):
+    '''Start a new section.'''
+    SECTIONS.append(Section(name))
 
 
 def O(*parts):
-    b = []
+    '''Add an instruction, or one instruction per operand of a Block.'''
+    head, block, tail = [], None, []
     for p in parts:
-        if isinstance(p, list):
+        if isinstance(p, Block):
+            block = p
+            continue
+        b = head if block is None else tail
+        if isinstance(p, (list, bytes)):
             b.extend(p)
         else:
             b.append(p)
-    sys.stdout.buffer.write(bytes(b))
-    sys.stdout.flush()
+    block = NONE if block is None else block
+    SECTIONS[-1].forms.append(Form(bytes(head), block, bytes(tail)))
+
+
+def dedup(sections):
+    '''Drop the forms adding no decode path to the others.
+
+    Forms are grouped by Form.decode_key(), and a form is dropped if another
+    form of its group covers its operands, of two forms with the same
+    operands keeping the one with the fewest prefixes, then the first one,
+    unless it is the first form of a prefix byte none of the kept forms have.
+    Returns new Sections of the forms kept, leaving out sections left empty.'''
+    forms = [f for s in sections for f in s.forms]
+    rank = {id(f): (len(f.prefixes()), i) for i, f in enumerate(forms)}
+    groups = collections.defaultdict(list)
+    for f in forms:
+        groups[f.decode_key()].append(f)
+
+    dropped = set()
+    for group in groups.values():
+        for f in group:
+            for g in group:
+                if g is f or not g.block.covers(f.block):
+                    continue
+                if not f.block.covers(g.block) or rank[id(g)] < rank[id(f)]:
+                    dropped.add(id(f))
+                    break
+
+    # every prefix byte is looked up on its own, keep the first form of any
+    # prefix byte no kept form has
+    seen = {p for f in forms if id(f) not in dropped for p in f.prefixes()}
+    for f in forms:
+        if id(f) in dropped and set(f.prefixes()) - seen:
+            dropped.discard(id(f))
+            seen.update(f.prefixes())
+
+    kept = []
+    for s in sections:
+        section = Section(s.name)
+        section.forms = [f for f in s.forms if id(f) not in dropped]
+        if section.forms:
+            kept.append(section)
+    return kept
+
+
+def reduce(sections):
+    '''Replace the operands of every form by Block.reduced, one operand of
+    every length class. Returns new Sections.'''
+    reduced = []
+    for s in sections:
+        section = Section(s.name)
+        section.forms = [Form(f.head, f.block.reduced, f.tail)
+                         for f in s.forms]
+        reduced.append(section)
+    return reduced
+
+
+def apportion(n, weights):
+    '''Split `n`, at most sum(weights), into parts proportional to `weights`,
+    giving the parts left over to the largest remainders.'''
+    total = sum(weights)
+    parts = [n * w // total for w in weights]
+    order = sorted(range(len(weights)),
+                   key=lambda i: -(n * weights[i] % total))
+    for i in order[:n - sum(parts)]:
+        parts[i] += 1
+    return parts
+
+
+def sample(sections, n, seed=0):
+    '''A stratified random sample of `n` of the instructions of `sections`.
+
+    Every section gets one instruction if `n` allows, and the rest of `n` is
+    apportioned between the sections by their instruction counts, then
+    between the forms of each section the same way. The instructions of a
+    form are drawn without replacement by index and kept in order, only the
+    operands drawn being built, so the cost scales with `n`. The same `seed`
+    gives the same sample. Returns new Sections.'''
+    counts = [len(s) for s in sections]
+    if n >= sum(counts):
+        return list(sections)
+    if n >= len(sections):
+        parts = [1 + p for p in apportion(n - len(sections),
+                                          [c - 1 for c in counts])]
+    else:
+        parts = apportion(n, counts)
+
+    rng = random.Random(seed)
+    sampled = []
+    for s, k in zip(sections, parts):
+        if not k:
+            continue
+        section = Section(s.name)
+        for f, m in zip(s.forms, apportion(k, [len(f) for f in s.forms])):
+            if m == len(f):
+                section.forms.append(f)
+                continue
+            if not m:
+                continue
+            drawn = sorted(rng.sample(range(len(f)), m))
+            operands = [f.block[i] for i in drawn]
+            block = Block(lambda operands=operands: operands, m,
+                          sum(map(len, operands)))
+            section.forms.append(Form(f.head, block, f.tail))
+        sampled.append(section)
+    return sampled
+
+
+def totals():
+    '''The number of forms, instructions and bytes of SECTIONS.'''
+    return (sum(len(s.forms) for s in SECTIONS), sum(map(len, SECTIONS)),
+            sum(s.size() for s in SECTIONS))
+
+
+def _stages(deduplicate, reduced, n=None, seed=0):
+    '''Apply the --dedup, --reduce and --sample stages to SECTIONS.'''
+    if deduplicate:
+        SECTIONS[:] = dedup(SECTIONS)
+    if reduced:
+        SECTIONS[:] = reduce(SECTIONS)
+    if n is not None:
+        SECTIONS[:] = sample(SECTIONS, n, seed)
+
+
+def iter_sections():
+    '''Yield every Section in output order.'''
+    yield from SECTIONS
+
+
+def iter_instructions():
+    '''Yield the bytes of every instruction in output order.'''
+    for section in SECTIONS:
+        yield from section
+
+
+def shards(n):
+    '''Split SECTIONS into at most `n` contiguous (start, stop) ranges of
+    roughly equal output size.'''
+    sizes = [s.size() for s in SECTIONS]
+    target = sum(sizes) / n
+    ranges, start, acc = [], 0, 0
+    for i, size in enumerate(sizes):
+        acc += size
+        if acc >= target * (len(ranges) + 1) and len(ranges) < n - 1:
+            ranges.append((start, i + 1))
+            start = i + 1
+    if start < len(SECTIONS):
+        ranges.append((start, len(SECTIONS)))
+    return ranges
+
+
+def index():
+    '''The byte offset, size, instruction ordinal and count of every section.
+
+    This is computed from the shape of each form without generating any
+    instructions.'''
+    entries = []
+    offset = ordinal = 0
+    for section in SECTIONS:
+        size, count = section.size(), len(section)
+        entries.append({
+            'name': section.name,
+            'opcodes': [o.hex() for o in section.opcodes()],
+            'offset': offset,
+            'size': size,
+            'ordinal': ordinal,
+            'count': count,
+        })
+        offset += size
+        ordinal += count
+    return entries
+
+
+def render(shard, lengths=False, vectorize=False):
+    '''Generate the sections SECTIONS[start:stop] of a (start, stop) shard.
+
+    Returns a (data, lengths) tuple per section, lengths being empty unless
+    requested. With `vectorize` the numpy backend is used.'''
+    start, stop = shard
+    return [
+        (s.tobytes(vectorize), s.lengths() if lengths else b'')
+        for s in SECTIONS[start:stop]
+    ]
 
 
 # byte values for operands
@@ -43,2281 +520,829 @@ imm32 = [_imm, _imm, _imm, _imm]
 rel8 = [_rel]
 rel16 = [_rel, _rel]
 rel32 = [_rel, _rel, _rel, _rel]
-moffs8 = [_moffs, _moffs, _moffs, _moffs]
-moffs16 = [_moffs, _moffs, _moffs, _moffs]
 moffs32 = [_moffs, _moffs, _moffs, _moffs]
 ptr16_16 = [_off, _off, _sel, _sel]
 ptr16_32 = [_off, _off, _off, _off, _sel, _sel]
-m16_16 = [_off, _off, _sel, _sel]
-m16_32 = [_off, _off, _off, _off, _sel, _sel]
 
 
 # prefixes
 pos = 0x66 # Operand size override
-pps = 0x66 # Precision size override
 pas = 0x67 # Address size override
-p2b = 0x0f # Two byte opcode
-pdp = 0xf2 # Scalar double precision
-psp = 0xf3 # Scalar single precision
 
 
-def modrm16(modonly=None, regonly=None):
-    for modrm in range(0xff + 1):
-        mod, reg, rm = modrm >> 6, (modrm >> 3) & 7, modrm & 7
-        if modonly is not None and mod not in modonly:
-            continue
-        if regonly is not None and reg not in regonly:
-            continue
-        disp = []
-        if mod == 0 and rm == 6:
-            disp = disp16
-        elif mod == 1:
-            disp = disp8
-        elif mod == 2:
-            disp = disp16
-        yield [modrm] + disp
+# every legacy prefix byte
+PREFIXES = bytes([
+    0x26, 0x2e, 0x36, 0x3e, 0x64, 0x65, 0x66, 0x67, 0xf0, 0xf2, 0xf3])
 
 
-def modrm32(modonly=None, regonly=None):
+def modrms(modonly=None, regonly=None):
+    '''Yield (modrm, mod, rm) for every ModRM byte passing the filters.'''
     for modrm in range(0xff + 1):
         mod, reg, rm = modrm >> 6, (modrm >> 3) & 7, modrm & 7
         if modonly is not None and mod not in modonly:
             continue
         if regonly is not None and reg not in regonly:
             continue
-        if mod == 0 and rm == 5:
-            disp = disp32
-        elif mod == 1:
-            disp = disp8
-        elif mod == 2:
-            disp = disp32
-        else:
-            disp = []
-        if mod < 3 and rm == 4:
-            for sib in range(0xff + 1):
-                if sib & 7 == 5 and mod == 0:
-                    yield [modrm, sib] + disp32
-                else:
-                    yield [modrm, sib] + disp
-        else:
-            yield [modrm] + disp
-
-
-# ADD r/m8, r8
-for b in modrm32():
-    O(0x00, b)
-for b in modrm16():
-    O(pas, 0x00, b)
-
-
-# ADD r/m16/32, r16/32
-for b in modrm32():
-    O(0x01, b)
-for b in modrm32():
-    O(pos, 0x01, b)
-for b in modrm16():
-    O(pas, 0x01, b)
-for b in modrm16():
-    O(pas, pos, 0x01, b)
-
-
-# ADD r8, r/m8
-for b in modrm32():
-    O(0x02, b)
-for b in modrm16():
-    O(pas, 0x02, b)
-
-
-# ADD r16/32, r/m16/32
-for b in modrm32():
-    O(0x03, b)
-for b in modrm32():
-    O(pos, 0x03, b)
-for b in modrm16():
-    O(pas, 0x03, b)
-for b in modrm16():
-    O(pas, pos, 0x03, b)
-
-
-# ADD AL, imm8
-O(0x04, imm8)
-
-
-# ADD E?AX, imm16/32
-O(0x05, imm32)
-O(pos, 0x05, imm16)
-
-
-# PUSH ES
-O(0x06)
-
-
-# POP ES
-O(0x07)
-
-
-# OR r/m8, r8
-for b in modrm32():
-    O(0x08, b)
-for b in modrm16():
-    O(pas, 0x08, b)
-
-
-# OR r/m16/32, r16/32
-for b in modrm32():
-    O(0x09, b)
-for b in modrm32():
-    O(pos, 0x09, b)
-for b in modrm16():
-    O(pas, 0x09, b)
-for b in modrm16():
-    O(pas, pos, 0x09, b)
-
-
-# OR r8, r/m8
-for b in modrm32():
-    O(0x0a, b)
-for b in modrm16():
-    O(pas, 0x0a, b)
-
-
-# OR r16/32, r/m16/32
-for b in modrm32():
-    O(0x0b, b)
-for b in modrm32():
-    O(pos, 0x0b, b)
-for b in modrm16():
-    O(pas, 0x0b, b)
-for b in modrm16():
-    O(pas, pos, 0x0b, b)
-
-
-# OR AL, imm8
-O(0x0c, imm8)
-
-
-# OR E?AX, imm16/32
-O(0x0d, imm32)
-O(pos, 0x0d, imm16)
-
-
-# PUSH CS
-O(0x0e)
-
-
-# 0x0f (2 byte instructions)
-
-
-# ADC r/m8, r8
-for b in modrm32():
-    O(0x10, b)
-for b in modrm16():
-    O(pas, 0x10, b)
-
-
-# ADC r/m16/32, r16/32
-for b in modrm32():
-    O(0x11, b)
-for b in modrm32():
-    O(pos, 0x11, b)
-for b in modrm16():
-    O(pas, 0x11, b)
-for b in modrm16():
-    O(pas, pos, 0x11, b)
-
-
-# ADC r8, r/m8
-for b in modrm32():
-    O(0x12, b)
-for b in modrm16():
-    O(pas, 0x12, b)
-
-
-# ADC r16/32, r/m16/32
-for b in modrm32():
-    O(0x13, b)
-for b in modrm32():
-    O(pos, 0x13, b)
-for b in modrm16():
-    O(pas, 0x13, b)
-for b in modrm16():
-    O(pas, pos, 0x13, b)
-
-
-# ADC AL, imm8
-O(0x14, imm8)
-
-
-# ADC E?AX, imm16/32
-O(0x15, imm32)
-O(pos, 0x15, imm16)
-
-
-# PUSH SS
-O(0x16)
-
-
-# POP SS
-O(0x17)
-
-
-# SBB r/m8, r8
-for b in modrm32():
-    O(0x18, b)
-for b in modrm16():
-    O(pas, 0x18, b)
-
-
-# SBB r/m16/32, r16/32
-for b in modrm32():
-    O(0x19, b)
-for b in modrm32():
-    O(pos, 0x19, b)
-for b in modrm16():
-    O(pas, 0x19, b)
-for b in modrm16():
-    O(pas, pos, 0x19, b)
-
-
-# SBB r8, r/m8
-for b in modrm32():
-    O(0x1a, b)
-for b in modrm16():
-    O(pas, 0x1a, b)
-
-
-# SBB r16/32, r/m16/32
-for b in modrm32():
-    O(0x1b, b)
-for b in modrm32():
-    O(pos, 0x1b, b)
-for b in modrm16():
-    O(pas, 0x1b, b)
-for b in modrm16():
-    O(pas, pos, 0x1b, b)
-
-
-# SBB AL, imm8
-O(0x1c, imm8)
-
-
-# SBB E?AX, imm16/32
-O(0x1d, imm32)
-O(pos, 0x1d, imm16)
-
-
-# POP DS
-O(0x1e)
-
-
-# POP DS
-O(0x1f)
-
-
-# AND r/m8, r8
-for b in modrm32():
-    O(0x20, b)
-for b in modrm16():
-    O(pas, 0x20, b)
-
-
-# AND r/m16/32, r16/32
-for b in modrm32():
-    O(0x21, b)
-for b in modrm32():
-    O(pos, 0x21, b)
-for b in modrm16():
-    O(pas, 0x21, b)
-for b in modrm16():
-    O(pas, pos, 0x21, b)
-
-
-# AND r8, r/m8
-for b in modrm32():
-    O(0x22, b)
-for b in modrm16():
-    O(pas, 0x22, b)
-
-
-# AND r16/32, r/m16/32
-for b in modrm32():
-    O(0x23, b)
-for b in modrm32():
-    O(pos, 0x23, b)
-for b in modrm16():
-    O(pas, 0x23, b)
-for b in modrm16():
-    O(pas, pos, 0x23, b)
-
-
-# AND AL, imm8
-O(0x24, imm8)
-
-
-# AND E?AX, imm16/32
-O(0x25, imm32)
-O(pos, 0x25, imm16)
-
-
-# 0x26 ES segment prefix
-
-
-# DAA
-O(0x27)
-
-
-# SUB r/m8, r8
-for b in modrm32():
-    O(0x28, b)
-for b in modrm16():
-    O(pas, 0x28, b)
-
-
-# SUB r/m16/32, r16/32
-for b in modrm32():
-    O(0x29, b)
-for b in modrm32():
-    O(pos, 0x29, b)
-for b in modrm16():
-    O(pas, 0x29, b)
-for b in modrm16():
-    O(pas, pos, 0x29, b)
-
-
-# SUB r8, r/m8
-for b in modrm32():
-    O(0x2a, b)
-for b in modrm16():
-    O(pas, 0x2a, b)
-
-
-# SUB r16/32, r/m16/32
-for b in modrm32():
-    O(0x2b, b)
-for b in modrm32():
-    O(pos, 0x2b, b)
-for b in modrm16():
-    O(pas, 0x2b, b)
-for b in modrm16():
-    O(pas, pos, 0x2b, b)
-
-
-# SUB AL, imm8
-O(0x2c, imm8)
-
-
-# SUB E?AX, imm16/32
-O(0x2d, imm32)
-O(pos, 0x2d, imm16)
-
-
-# 0x2e CS segment prefix
-
-
-# DAS
-O(0x2f)
-
-
-# XOR r/m8, r8
-for b in modrm32():
-    O(0x30, b)
-for b in modrm16():
-    O(pas, 0x30, b)
-
-
-# XOR r/m16/32, r16/32
-for b in modrm32():
-    O(0x31, b)
-for b in modrm32():
-    O(pos, 0x31, b)
-for b in modrm16():
-    O(pas, 0x31, b)
-for b in modrm16():
-    O(pas, pos, 0x31, b)
-
-
-# XOR r8, r/m8
-for b in modrm32():
-    O(0x32, b)
-for b in modrm16():
-    O(pas, 0x32, b)
-
-
-# XOR r16/32 r/m16/32
-for b in modrm32():
-    O(0x33, b)
-for b in modrm32():
-    O(pos, 0x33, b)
-for b in modrm16():
-    O(pas, 0x33, b)
-for b in modrm16():
-    O(pas, pos, 0x33, b)
-
-
-# XOR AL, imm8
-O(0x34, imm8)
-
-
-# XOR E?AX, imm16/32
-O(0x35, imm32)
-O(pos, 0x35, imm16)
-
-
-# 0x36 SS segment prefix
-
-
-# AAA
-O(0x37)
-
-
-# CMP r/m8, r8
-for b in modrm32():
-    O(0x38, b)
-for b in modrm16():
-    O(pas, 0x38, b)
-
-
-# CMP r/m16/32, r16/32
-for b in modrm32():
-    O(0x39, b)
-for b in modrm32():
-    O(pos, 0x39, b)
-for b in modrm16():
-    O(pas, 0x39, b)
-for b in modrm16():
-    O(pas, pos, 0x39, b)
-
-
-# CMP r8, r/m8
-for b in modrm32():
-    O(0x3a, b)
-for b in modrm16():
-    O(pas, 0x3a, b)
-
-
-# CMP r16/32, r/m16/32
-for b in modrm32():
-    O(0x3b, b)
-for b in modrm32():
-    O(pos, 0x3b, b)
-for b in modrm16():
-    O(pas, 0x3b, b)
-for b in modrm16():
-    O(pas, pos, 0x3b, b)
-
-
-# CMP AL, imm8
-O(0x3c, imm8)
-
-
-# CMP E?AX, imm16/32
-O(0x3d, imm32)
-O(pos, 0x3d, imm16)
-
-
-# 0x3e DS segment prefix
-
-
-# AAS
-O(0x3f)
-
-
-# INC E?(AX|CX|DX|BX|SP|BP|SI|DI)
-for op in range(0x40, 0x48):
-    O(op)
-for op in range(0x40, 0x48):
-    O(pos, op)
-
-
-# DEC E?(AX|CX|DX|BX|SP|BP|SI|DI)
-for op in range(0x48, 0x50):
-    O(op)
-for op in range(0x48, 0x50):
-    O(pos, op)
-
-
-# PUSH E?(AX|CX|DX|BX|SP|BP|SI|DI)
-for op in range(0x50, 0x58):
-    O(op)
-for op in range(0x50, 0x58):
-    O(pos, op)
-
-
-# POP E?(AX|CX|DX|BX|SP|BP|SI|DI)
-for op in range(0x58, 0x60):
-    O(op)
-for op in range(0x58, 0x60):
-    O(pos, op)
-
-
-# PUSHAD?
-O(0x60)
-O(pos, 0x60)
-
-
-# POPAD?
-O(0x61)
-O(pos, 0x61)
-
-
-# BOUND r16/32, m16/32&16/32
-for b in modrm32(modonly=[0, 1, 2]):
-    O(0x62, b)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, 0x62, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, 0x62, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, 0x62, b)
-
-
-# ARPL r/m16, r16
-for b in modrm32():
-    O(0x63, b)
-for b in modrm16():
-    O(pas, 0x63, b)
-
-
-# 0x64 FS segment prefix
-
-
-# 0x65 GS segment prefix
-
-
-# 0x66 Operand/Precision size override
-
-
-# 0x67 Address size override
-
-
-# PUSH imm16/32
-O(0x68, imm32)
-O(pos, 0x68, imm16)
-
-
-# IMUL r16/32, r/m16/32, imm16/32
-for b in modrm32():
-    O(0x69, b, imm32)
-for b in modrm32():
-    O(pos, 0x69, b, imm16)
-for b in modrm16():
-    O(pas, 0x69, b, imm32)
-for b in modrm16():
-    O(pas, pos, 0x69, b, imm16)
-
+        yield modrm, mod, rm
 
-# PUSH imm8
-O(0x6a, imm8)
 
+def cached(shape, operand):
+    '''Build each filtered operand set at most once, as a Block.
 
-# IMUL r16/32, r/m16/32, imm8
-for b in modrm32():
-    O(0x6b, b, imm8)
-for b in modrm32():
-    O(pos, 0x6b, b, imm8)
-for b in modrm16():
-    O(pas, 0x6b, b, imm8)
-for b in modrm16():
-    O(pas, pos, 0x6b, b, imm8)
+    `shape(mod, rm)` gives the (count, size) of the operands of a single
+    ModRM byte, so the Block's count and size are known without generating
+    any of the operands, and `operand(modrm, mod, rm, i)` the `i`th of them,
+    so any operand of the Block can be built on its own.'''
 
+    def decorator(f):
+        cache = {}
 
-# INS m8
-O(0x6c)
+        @functools.wraps(f)
+        def wrapper(modonly=None, regonly=None):
+            key = (
+                None if modonly is None else tuple(modonly),
+                None if regonly is None else tuple(regonly),
+            )
+            if key not in cache:
+                count = size = 0
+                starts, fields = [], []
+                for modrm, mod, rm in modrms(modonly, regonly):
+                    starts.append(count)
+                    fields.append((modrm, mod, rm))
+                    c, n = shape(mod, rm)
+                    count += c
+                    size += n
 
+                def index(i):
+                    j = bisect.bisect_right(starts, i) - 1
+                    return operand(*fields[j], i - starts[j])
 
-# INS m16/32
-O(0x6d)
-O(pos, 0x6d)
+                generate = functools.partial(f, modonly, regonly)
+                cache[key] = Block(generate, count, size,
+                                   (f.__name__,) + key, index)
+            return cache[key]
 
+        return wrapper
 
-# OUTS m8
-O(0x6e)
+    return decorator
 
 
-# OUTS m16/32
-O(0x6f)
-O(pos, 0x6f)
+def modrm16_disp(mod, rm):
+    if mod == 0 and rm == 6:
+        return disp16
+    elif mod == 1:
+        return disp8
+    elif mod == 2:
+        return disp16
+    return []
 
 
-# J(O|NO|C|NC|Z|NZ|NA|A|S|NS|PE|PO|L|NL|NG|G) rel8
-for op in range(0x70, 0x80):
-    O(op, rel8)
+def modrm16_shape(mod, rm):
+    return 1, 1 + len(modrm16_disp(mod, rm))
 
 
-# (ADD|OR|ADC|SBB|AND|SUB|XOR|CMP) r/m8, imm8
-for b in modrm32():
-    O(0x80, b, imm8)
-for b in modrm16():
-    O(pas, 0x80, b, imm8)
+def modrm16_operand(modrm, mod, rm, i):
+    return [modrm] + modrm16_disp(mod, rm)
 
 
-# (ADD|OR|ADC|SBB|AND|SUB|XOR|CMP) r/m16/32, imm16/32
-for b in modrm32():
-    O(0x81, b, imm32)
-for b in modrm32():
-    O(pos, 0x81, b, imm16)
-for b in modrm16():
-    O(pas, 0x81, b, imm32)
-for b in modrm16():
-    O(pas, pos, 0x81, b, imm16)
-
-
-# (ADD|OR|ADC|SBB|AND|SUB|XOR|CMP) r/m8, imm8
-for b in modrm32():
-    O(0x82, b, imm8)
-for b in modrm16():
-    O(pas, 0x82, b, imm8)
-
-
-# (ADD|OR|ADC|SBB|AND|SUB|XOR|CMP) r/m16/32, imm8
-for b in modrm32():
-    O(0x83, b, imm8)
-for b in modrm32():
-    O(pos, 0x83, b, imm8)
-for b in modrm16():
-    O(pas, 0x83, b, imm8)
-for b in modrm16():
-    O(pas, pos, 0x83, b, imm8)
-
-
-# TEST r/m8, r8
-for b in modrm32():
-    O(0x84, b)
-for b in modrm16():
-    O(pas, 0x84, b)
-
-
-## TEST r/m16/32, r16/32
-for b in modrm32():
-    O(0x85, b)
-for b in modrm32():
-    O(pos, 0x85, b)
-for b in modrm16():
-    O(pas, 0x85, b)
-for b in modrm16():
-    O(pas, pos, 0x85, b)
-
-
-# XCHG r/m8, r8
-for b in modrm32():
-    O(0x86, b)
-for b in modrm16():
-    O(pas, 0x86, b)
-
-
-## XCHG r/m16/32, r16/32
-for b in modrm32():
-    O(0x87, b)
-for b in modrm32():
-    O(pos, 0x87, b)
-for b in modrm16():
-    O(pas, 0x87, b)
-for b in modrm16():
-    O(pas, pos, 0x87, b)
-
-
-# MOV r/m8, r8
-for b in modrm32():
-    O(0x88, b)
-for b in modrm16():
-    O(pas, 0x88, b)
-
-
-## MOV r/m16/32, r16/32
-for b in modrm32():
-    O(0x89, b)
-for b in modrm32():
-    O(pos, 0x89, b)
-for b in modrm16():
-    O(pas, 0x89, b)
-for b in modrm16():
-    O(pas, pos, 0x89, b)
-
-
-# MOV r8, r/m8
-for b in modrm32():
-    O(0x8a, b)
-for b in modrm16():
-    O(pas, 0x8a, b)
-
-
-## MOV r16/32, r/m16/32
-for b in modrm32():
-    O(0x8b, b)
-for b in modrm32():
-    O(pos, 0x8b, b)
-for b in modrm16():
-    O(pas, 0x8b, b)
-for b in modrm16():
-    O(pas, pos, 0x8b, b)
-
-
-# MOV r/m16/32, Sreg
-for b in modrm32(regonly=[0, 1, 2, 3, 4, 5]):
-    O(0x8c, b)
-for b in modrm16(regonly=[0, 1, 2, 3, 4, 5]):
-    O(pas, 0x8c, b)
-
-
-# LEA r16/32, m
-for b in modrm32(modonly=[0, 1, 2]):
-    O(0x8d, b)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, 0x8d, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, 0x8d, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, 0x8d, b)
-
-
-# MOV Sreg, r/m16
-for b in modrm32(regonly=[0, 1, 2, 3, 4, 5]):
-    O(0x8e, b)
-for b in modrm16(regonly=[0, 1, 2, 3, 4, 5]):
-    O(pas, 0x8e, b)
-
-
-# POP r/m16/32
-for b in modrm32(regonly=[0]):
-    O(0x8f, b)
-for b in modrm32(regonly=[0]):
-    O(pos, 0x8f, b)
-for b in modrm16(regonly=[0]):
-    O(pas, 0x8f, b)
-for b in modrm16(regonly=[0]):
-    O(pas, pos, 0x8f, b)
-
-
-# XCHG E?AX, E?(AX|CX|DX|BX|SP|BP|SI|DI)
-for op in range(0x90, 0x98):
-    O(op)
-for op in range(0x90, 0x98):
-    O(pos, op)
-
-
-# C(BW|WDE)
-O(0x98)
-O(pos, 0x98)
-
-
-# C(WD|DQ)
-O(0x99)
-O(pos, 0x99)
-
-
-# CALLF ptr16:16/32
-O(0x9a, ptr16_32)
-O(pos, 0x9a, ptr16_16)
-
-
-# WAIT
-O(0x9b)
-
-
-# PUSHFD?
-O(0x9c)
-O(pos, 0x9c)
-
-
-# POPFD?
-O(0x9d)
-O(pos, 0x9d)
-
-
-# SAHF
-O(0x9e)
-
-
-# LAHF
-O(0x9f)
-
-
-# MOV AL, moffs8
-O(0xa0, moffs8)
-
-
-# MOV E?AX, moffs16/32
-O(0xa1, moffs32)
-O(pos, 0xa1, moffs16)
-
-
-# MOV moffs8, AL
-O(0xa2, moffs8)
-
-
-# MOV moffs16/32, E?AX
-O(0xa3, moffs32)
-O(pos, 0xa3, moffs16)
-
-
-# MOVSB
-O(0xa4)
-
-
-# MOVS(W|D)
-O(0xa5)
-O(pos, 0xa5)
-
-
-# CMPSB
-O(0xa6)
-
-
-# CMPS(W|D)
-O(0xa7)
-O(pos, 0xa7)
-
-
-# TEST AL, imm8
-O(0xa8, imm8)
-
-
-# TEST E?AX, imm16/32
-O(0xa9, imm32)
-O(pos, 0xa9, imm16)
-
-
-# STOSB
-O(0xaa)
-
-
-# STOS(W|D)
-O(0xab)
-O(pos, 0xab)
-
-
-# LODSB
-O(0xac)
-
-
-# LODS(W|D)
-O(0xad)
-O(pos, 0xad)
-
-
-# SCASB
-O(0xae)
-
-
-# SCAS(W|D)
-O(0xaf)
-O(pos, 0xaf)
-
-
-# MOV (AL|CL|DL|BL|AH|CH|DH|BH), imm8
-for op in range(0xb0, 0xb8):
-    O(op, imm8)
-
-
-# MOV E?(AX|CX|DX|BX|SP|BP|SI|DI), imm16/32
-for op in range(0xb8, 0xc0):
-    O(op, imm32)
-for op in range(0xb8, 0xc0):
-    O(pos, op, imm16)
-
-
-
-# (ROL|ROR|RCL|RCR|SHL|SHR|SAL|SAR) r/m8, imm8
-for b in modrm32():
-    O(0xc0, b, imm8)
-for b in modrm16():
-    O(pas, 0xc0, b, imm8)
-
-
-# (ROL|ROR|RCL|RCR|SHL|SHR|SAL|SAR) r/m16/32, imm8
-for b in modrm32():
-    O(0xc1, b, imm8)
-for b in modrm32():
-    O(pos, 0xc1, b, imm8)
-for b in modrm16():
-    O(pas, 0xc1, b, imm8)
-for b in modrm16():
-    O(pas, pos, 0xc1, b, imm8)
-
-
-# RETN imm16
-O(0xc2, imm16)
-
-
-# RETN
-O(0xc3)
-
-
-# LES ES, r16/32, m16:16/32
-for b in modrm32(modonly=[0, 1, 2]):
-    O(0xc4, b)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, 0xc4, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, 0xc4, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, 0xc4, b)
-
-
-# LDS DS, r16/32, m16:16/32
-for b in modrm32(modonly=[0, 1, 2]):
-    O(0xc5, b)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, 0xc5, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, 0xc5, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, 0xc5, b)
-
-
-# MOV r/m8, imm8
-for b in modrm32(regonly=[0]):
-    O(0xc6, b, imm8)
-for b in modrm16(regonly=[0]):
-    O(pas, 0xc6, b, imm8)
-
-
-# MOV r/m16/32, imm16/32
-for b in modrm32(regonly=[0]):
-    O(0xc7, b, imm32)
-for b in modrm32(regonly=[0]):
-    O(pos, 0xc7, b, imm16)
-for b in modrm16(regonly=[0]):
-    O(pas, 0xc7, b, imm32)
-for b in modrm16(regonly=[0]):
-    O(pas, pos, 0xc7, b, imm16)
-
-
-# ENTER
-O(0xc8, imm16, imm8)
-
-
-# LEAVE
-O(0xc9)
-
-
-# RETF imm16
-O(0xca, imm16)
-
-
-# RETF
-O(0xcb)
-
-
-# INT3
-O(0xcc)
-
-
-# INT imm8
-O(0xcd, imm8)
-
-
-# INTO
-O(0xce)
-
-
-# IRETD?
-O(0xcf)
-O(0x66, 0xcf)
-
-
-# (ROL|ROR|RCL|RCR|SHL|SHR|SAL|SAR) r/m8, 1
-for b in modrm32():
-    O(0xd0, b)
-for b in modrm16():
-    O(pas, 0xd0, b)
-
-
-# (ROL|ROR|RCL|RCR|SHL|SHR|SAL|SAR) r/m16/32, 1
-for b in modrm32():
-    O(0xd1, b)
-for b in modrm32():
-    O(pos, 0xd1, b)
-for b in modrm16():
-    O(pas, 0xd1, b)
-for b in modrm16():
-    O(pas, pos, 0xd1, b)
-
-
-# (ROL|ROR|RCL|RCR|SHL|SHR|SAL|SAR) r/m8, CL
-for b in modrm32():
-    O(0xd2, b)
-for b in modrm16():
-    O(pas, 0xd2, b)
-
-
-# (ROL|ROR|RCL|RCR|SHL|SHR|SAL|SAR) r/m16/32, CL
-for b in modrm32():
-    O(0xd3, b)
-for b in modrm32():
-    O(pos, 0xd3, b)
-for b in modrm16():
-    O(pas, 0xd3, b)
-for b in modrm16():
-    O(pas, pos, 0xd3, b)
-
-
-# AAM AL, AH(, imm8)?
-O(0xd4, 0x0a)
-O(0xd4, imm8)
-
-
-# AAD AL, AH(, imm8)?
-O(0xd5, 0x0a)
-O(0xd5, imm8)
-
-
-# SALC
-O(0xd6)
-
-
-# XLAT AL, m8
-O(0xd7)
-
-
-# (FADD|FMUL|FCOM|FCOMP|FSUB|FSUBR|FDIV|FDIVR) ST STi/m32real
-for b in modrm32():
-    O(0xd8, b)
-for b in modrm16():
-    O(pas, 0xd8, b)
-
-
-# FLD ST STi/m32real
-for b in modrm32(regonly=[0]):
-    O(0xd9, b)
-for b in modrm16(regonly=[0]):
-    O(pas, 0xd9, b)
-# FXCH ST, STi
-for b in modrm32(modonly=[3], regonly=[1]):
-    O(0xd9, b)
-# FST m32real, ST
-for b in modrm32(modonly=[0, 1, 2], regonly=[2]):
-    O(0xd9, b)
-for b in modrm16(modonly=[0, 1, 2], regonly=[2]):
-    O(pas, 0xd9, b)
-# FNOP
-O(0xd9, 0xd0)
-# FSTP STi/m32real, ST
-for b in modrm32(regonly=[3]):
-    O(0xd9, b)
-for b in modrm16(regonly=[3]):
-    O(pas, 0xd9, b)
-# FLDENV m14/28
-for b in modrm32(modonly=[0, 1, 2], regonly=[4]):
-    O(0xd9, b)
-for b in modrm16(modonly=[0, 1, 2], regonly=[4]):
-    O(pas, 0xd9, b)
-# FCHS ST
-O(0xd9, 0xe0)
-# FABS ST
-O(0xd9, 0xe1)
-# FTST ST
-O(0xd9, 0xe4)
-# FXAM ST
-O(0xd9, 0xe5)
-# FLDCW m16
-for b in modrm32(modonly=[0, 1, 2], regonly=[5]):
-    O(0xd9, b)
-for b in modrm16(modonly=[0, 1, 2], regonly=[5]):
-    O(pas, 0xd9, b)
-# FLD1 ST
-O(0xd9, 0xe8)
-# FLDL2T ST
-O(0xd9, 0xe9)
-# FLDL2E ST
-O(0xd9, 0xea)
-# FLDPI ST
-O(0xd9, 0xeb)
-# FLDLG2 ST
-O(0xd9, 0xec)
-# FLDLN2 ST
-O(0xd9, 0xed)
-# FLDZ ST
-O(0xd9, 0xee)
-# FN?STENV m14/28
-for b in modrm32(modonly=[0, 1, 2], regonly=[6]):
-    O(0xd9, b)
-for b in modrm16(modonly=[0, 1, 2], regonly=[6]):
-    O(pas, 0xd9, b)
-# (F2XM1|FYL2X|FPTAN|FPATAN|FXTRACT|FPREM1|FDECSTP|FINCSTP)
-for b in modrm32(modonly=[3], regonly=[6]):
-    O(0xd9, b)
-# FN?STCW m16
-for b in modrm32(modonly=[0, 1, 2], regonly=[7]):
-    O(0xd9, b)
-for b in modrm16(modonly=[0, 1, 2], regonly=[7]):
-    O(pas, 0xd9, b)
-# (FPREM|FYL2XP1|FSQRT|FSINCOS|FRNDINT|FSCALE|FSIN|FCOS)
-for b in modrm32(modonly=[3], regonly=[7]):
-    O(0xd9, b)
-
-
-# (FIADD|FIMUL|FICOM|FICOMP|FISUB|FISUBR|FIDIV|FIDIVR) ST, m32int
-for b in modrm32(modonly=[0, 1, 2]):
-    O(0xda, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, 0xda, b)
-# (FCMOVB|FCMOVE|FCMOVBE|FCMOVU) ST, STi
-for b in modrm32(modonly=[3], regonly=[0, 1, 2, 3]):
-    O(0xda, b)
-# FUCOMPP ST, ST1
-O(0xda, 0xe9)
-
-
-# (FILD|FISTTP|FIST|FISTP|FCMOVNB|FCMOVNE|FCMOVENBE|FCMOVNU)
-for b in modrm32(regonly=[0, 1, 2, 3]):
-    O(0xdb, b)
-for b in modrm16(regonly=[0, 1, 2, 3]):
-    O(pas, 0xdb, b)
-# FNENI
-O(0xdb, 0xe0)
-# FNDISI
-O(0xdb, 0xe1)
-# FNCLEX
-O(0xdb, 0xe2)
-# FNINIT
-O(0xdb, 0xe3)
-# FNSETPM
-O(0xdb, 0xe4)
-# (FLD|FSTP)
-for b in modrm32(modonly=[0, 1, 2], regonly=[5, 7]):
-    O(0xdb, b)
-for b in modrm16(modonly=[0, 1, 2], regonly=[5, 7]):
-    O(pas, 0xdb, b)
-# (FUCOMI|FCOMI)
-for b in modrm32(modonly=[3], regonly=[5, 6]):
-    O(0xdb, b)
-
-
-# (FADD|FMUL|FCOM|FCOM2|FCOMP|FCOMP3|FSUB|FSUBR|FDIV|FDIVR)
-for b in modrm32():
-    O(0xdc, b)
-for b in modrm16():
-    O(pas, 0xdc, b)
-
-
-# (FLD|FISTTP|FST|FSTP|FFREE|FXCH4)
-for b in modrm32(regonly=[0, 1, 2, 3]):
-    O(0xdd, b)
-for b in modrm16(regonly=[0, 1, 2, 3]):
-    O(pas, 0xdd, b)
-# (FRSTOR|FUCOM|FUCOMP)
-for b in modrm32(modonly=[3], regonly=[4, 5]):
-    O(0xdd, b)
-# (FN?SAVE|FN?STSW)
-for b in modrm32(modonly=[0, 1, 2], regonly=[6, 7]):
-    O(0xdd, b)
-for b in modrm16(modonly=[0, 1, 2], regonly=[6, 7]):
-    O(pas, 0xdd, b)
-
-
-# (FIADD|FIMUL|FICOM|FICOMP|FISUB|FISUBR|FIDIV|FIDIVR)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(0xde, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, 0xde, b)
-# (FADDP|FMULP|FCOMP5|FSUBRP|FSUBP|FDIVRP|FDIVP)
-for b in modrm32(modonly=[3], regonly=[0, 1, 2, 4, 5, 6, 7]):
-    O(0xde, b)
-# FCOMPP
-O(0xde, 0xd9)
-
-
-# (FILD|FISTTP|FIST|FISTP|FBLD|FBSTP|FISTP)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(0xdf, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, 0xdf, b)
-# (FFREEP|FXCH7|FSTP8|FSTP9|FUCOMIP|FCOMIP)
-for b in modrm32(modonly=[3], regonly=[0, 1, 2, 3, 5, 6]):
-    O(0xdf, b)
-# FNSTSW
-O(0xdf, 0xe0)
-
-
-# LOOPNZ E?CX, rel8
-O(0xe0, rel8)
-O(pas, 0xe0, rel8)
-
-
-# LOOPZ E?CX, rel8
-O(0xe1, rel8)
-O(pas, 0xe1, rel8)
-
-
-# LOOP E?CX, rel8
-O(0xe2, rel8)
-O(pas, 0xe2, rel8)
-
-
-# JCXZ rel8, E?CX
-O(0xe3, rel8)
-O(pas, 0xe3, rel8)
-
-
-# IN AL, imm8
-O(0xe4, imm8)
-
-
-# IN E?AX, imm8
-O(0xe5, imm8)
-O(pos, 0xe5, imm8)
-
-
-# OUT imm8, AL
-O(0xe6, imm8)
-
-
-# OUT imm8, E?AX
-O(0xe7, imm8)
-O(pos, 0xe7, imm8)
-
-
-# CALL rel16/32
-O(0xe8, rel32)
-O(pos, 0xe8, rel16)
-
-
-# JMP rel16/32
-O(0xe9, rel32)
-O(pos, 0xe9, rel16)
-
-
-# JMPF ptr16:16/32
-O(0xea, ptr16_32)
-O(pos, 0xea, ptr16_16)
-
-
-# JMP rel8
-O(0xeb, rel8)
-
-
-# IN AL, DX
-O(0xec)
-
-
-# IN E?AX, DX
-O(0xed)
-O(pos, 0xed)
-
-
-# OUT DX, AL
-O(0xee)
-
-
-# OUT DX, E?AX
-O(0xef)
-O(pos, 0xef)
-
-
-# 0xf0 Lock prefix
-
-
-# INT1
-O(0xf1)
-
-
-# 0xf2 (REPNZ|REP) Repeat string operation or Scalar double-precision prefix
-
-
-# 0xf3 (REPZ|REP) Repeat string operation or Scalar single-precision prefix
-
-
-# HALT
-O(0xf4)
-
-
-# CMC
-O(0xf5)
-
-
-# TEST r/m8, imm8
-for b in modrm32(regonly=[0, 1]):
-    O(0xf6, b, imm8)
-for b in modrm16(regonly=[0, 1]):
-    O(pas, 0xf6, b, imm8)
-# (NOT|NEG|MUL|IMUL|DIV|IDIV)
-for b in modrm32(regonly=[2, 3, 4, 5, 6, 7]):
-    O(0xf6, b)
-for b in modrm16(regonly=[2, 3, 4, 5, 6, 7]):
-    O(pas, 0xf6, b)
-
-
-# TEST r/m16/32, imm16/32
-for b in modrm32(regonly=[0, 1]):
-    O(0xf7, b, imm32)
-for b in modrm32(regonly=[0, 1]):
-    O(pos, 0xf7, b, imm16)
-for b in modrm16(regonly=[0, 1]):
-    O(pas, 0xf7, b, imm32)
-for b in modrm16(regonly=[0, 1]):
-    O(pas, pos, 0xf7, b, imm16)
-# (NOT|NEG|MUL|IMUL|DIV|IDIV)
-for b in modrm32(regonly=[2, 3, 4, 5, 6, 7]):
-    O(0xf7, b)
-for b in modrm32(regonly=[2, 3, 4, 5, 6, 7]):
-    O(pos, 0xf7, b)
-for b in modrm16(regonly=[2, 3, 4, 5, 6, 7]):
-    O(pas, 0xf7, b)
-for b in modrm16(regonly=[2, 3, 4, 5, 6, 7]):
-    O(pas, pos, 0xf7, b)
-
-
-# CLC
-O(0xf8)
-
-
-# STC
-O(0xf9)
-
-
-# CLI
-O(0xfa)
-
-
-# STI
-O(0xfb)
-
-
-# CLD
-O(0xfc)
-
-
-# STD
-O(0xfd)
-
-
-# (INC|DEC) r/m8
-for b in modrm32(regonly=[0, 1]):
-    O(0xfe, b)
-for b in modrm16(regonly=[0, 1]):
-    O(pas, 0xfe, b)
-
-
-# (INC|DEC|CALL|JMP|PUSH) r/m16/32
-for b in modrm32(regonly=[0, 1, 2, 4, 6]):
-    O(0xff, b)
-for b in modrm32(regonly=[0, 1, 2, 4, 6]):
-    O(pos, 0xff, b)
-for b in modrm16(regonly=[0, 1, 2, 4, 6]):
-    O(pas, 0xff, b)
-for b in modrm16(regonly=[0, 1, 2, 4, 6]):
-    O(pas, pos, 0xff, b)
-# (CALLF|JMPF) m16:16/32
-for b in modrm32(modonly=[0, 1, 2], regonly=[3, 5]):
-    O(0xff, b)
-for b in modrm32(modonly=[0, 1, 2], regonly=[3, 5]):
-    O(pos, 0xff, b)
-for b in modrm16(modonly=[0, 1, 2], regonly=[3, 5]):
-    O(pas, 0xff, b)
-for b in modrm16(modonly=[0, 1, 2], regonly=[3, 5]):
-    O(pas, pos, 0xff, b)
-
-
-# (SLDT|STR|LLDT|LTR|VERR|VERW)
-for b in modrm32(regonly=[0, 1, 2, 3, 4, 5]):
-    O(p2b, 0x00, b)
-for b in modrm16(regonly=[0, 1, 2, 3, 4, 5]):
-    O(pas, p2b, 0x00, b)
-
-
-# SGDT
-for b in modrm32(modonly=[0, 1, 2], regonly=[0]):
-    O(p2b, 0x01, b)
-for b in modrm16(modonly=[0, 1, 2], regonly=[0]):
-    O(pas, p2b, 0x01, b)
-# VMCALL
-O(p2b, 0x01, 0xc1)
-# VMLAUNCH
-O(p2b, 0x01, 0xc2)
-# VMRESUME
-O(p2b, 0x01, 0xc3)
-# VMXOFF
-O(p2b, 0x01, 0xc4)
-# SIDT
-for b in modrm32(modonly=[0, 1, 2], regonly=[1]):
-    O(p2b, 0x01, b)
-for b in modrm16(modonly=[0, 1, 2], regonly=[1]):
-    O(pas, p2b, 0x01, b)
-# MONITOR
-O(p2b, 0x01, 0xc8)
-# MWAIT
-O(p2b, 0x01, 0xc9)
-# CLAC
-O(p2b, 0x01, 0xca)
-# STAC
-O(p2b, 0x01, 0xca)
-# LGDT
-for b in modrm32(modonly=[0, 1, 2], regonly=[2]):
-    O(p2b, 0x01, b)
-for b in modrm16(modonly=[0, 1, 2], regonly=[2]):
-    O(pas, p2b, 0x01, b)
-# XGETBV
-O(p2b, 0x01, 0xd0)
-# XSETBV
-O(p2b, 0x01, 0xd1)
-# (LIDT|VMRUN|VMMCALL|VMLOAD|VMSAVE|STGI|CLGI|SKINIT|INVLPGA)
-for b in modrm32(modonly=[0, 1, 2], regonly=[3]):
-    O(p2b, 0x01, b)
-for b in modrm16(modonly=[0, 1, 2], regonly=[3]):
-    O(pas, p2b, 0x01, b)
-# SMSW
-for b in modrm32(regonly=[4]):
-    O(p2b, 0x01, b)
-for b in modrm16(regonly=[4]):
-    O(pas, p2b, 0x01, b)
-# LMSW
-for b in modrm32(regonly=[6]):
-    O(p2b, 0x01, b)
-for b in modrm16(regonly=[6]):
-    O(pas, p2b, 0x01, b)
-# INVLPG
-for b in modrm32(modonly=[0, 1, 2], regonly=[7]):
-    O(p2b, 0x01, b)
-for b in modrm16(modonly=[0, 1, 2], regonly=[7]):
-    O(pas, p2b, 0x01, b)
-# SWAPGS
-O(p2b, 0x01, 0xf8)
-# RTDSCP
-O(p2b, 0x01, 0xf9)
-
-
-# LAR
-for b in modrm32():
-    O(p2b, 0x02, b)
-for b in modrm32():
-    O(pos, p2b, 0x02, b)
-for b in modrm16():
-    O(pas, p2b, 0x02, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x02, b)
-
-
-# LSL
-for b in modrm32():
-    O(p2b, 0x03, b)
-for b in modrm32():
-    O(pos, p2b, 0x03, b)
-for b in modrm16():
-    O(pas, p2b, 0x03, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x03, b)
-
-
-# 0x0f 0x04 NA
-
-
-# 0x0f 0x05 NA
-
-
-# CLTS
-O(p2b, 0x06)
-
-
-# 0x0f 0x07 NA
-
-
-# INVD
-O(p2b, 0x08)
-
-
-# WBINVD
-O(p2b, 0x09)
-
-
-# 0x0f 0x0a NA
-
-
-# UD2
-O(p2b, 0x0b)
-
-
-# 0x0f 0x0c NA
-
-
-# Capstone doesn't disassemble this so we'll skip it
-# (PREFETCH|PREFETCHW|PREFETCHWT1)
-#for b in modrm32(modonly=[0, 1, 2], regonly=[0, 1, 2]):
-#    O(p2b, 0x0d, b)
-#for b in modrm16(modonly=[0, 1, 2], regonly=[0, 1, 2]):
-#    O(pas, p2b, 0x0d, b)
-
-
-# FEMMS
-O(p2b, 0x0e)
-
-
-# 0x0f 0x0f Reserved
-
-
-# (MOVUPS|MOVSS|MOVUPD|MOVSD) xmm, xmm/m32/64/218
-for b in modrm32():
-    O(p2b, 0x10, b)
-for b in modrm32():
-    O(pos, p2b, 0x10, b)
-for b in modrm32():
-    O(psp, p2b, 0x10, b)
-for b in modrm32():
-    O(pdp, p2b, 0x10, b)
-for b in modrm16():
-    O(pas, p2b, 0x10, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x10, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x10, b)
-for b in modrm16():
-    O(pas, pdp, p2b, 0x10, b)
-
-
-# (MOVUPS|MOVSS|MOVUPD|MOVSD) xmm/m32/64/218, xmm
-for b in modrm32():
-    O(p2b, 0x11, b)
-for b in modrm32():
-    O(pos, p2b, 0x11, b)
-for b in modrm32():
-    O(psp, p2b, 0x11, b)
-for b in modrm32():
-    O(pdp, p2b, 0x11, b)
-for b in modrm16():
-    O(pas, p2b, 0x11, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x11, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x11, b)
-for b in modrm16():
-    O(pas, pdp, p2b, 0x11, b)
-
-
-# (MOVHLPS|MOVLPS|MOVLPD|MOVDDUP|MOVSLDUP)
-for b in modrm32():
-    O(p2b, 0x12, b)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, p2b, 0x12, b)
-for b in modrm32():
-    O(psp, p2b, 0x12, b)
-for b in modrm32():
-    O(pdp, p2b, 0x12, b)
-for b in modrm16():
-    O(pas, p2b, 0x12, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, p2b, 0x12, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x12, b)
-for b in modrm16():
-    O(pas, pdp, p2b, 0x12, b)
-
-
-# (MOVLPS|MOVLPD)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(p2b, 0x13, b)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, p2b, 0x13, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, p2b, 0x13, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, p2b, 0x13, b)
-
-
-# (UNPCKLPS|UNPCKLPD)
-for b in modrm32():
-    O(p2b, 0x14, b)
-for b in modrm32():
-    O(pos, p2b, 0x14, b)
-for b in modrm16():
-    O(pas, p2b, 0x14, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x14, b)
-
-
-# (UNPCKHPS|UNPCKHPD)
-for b in modrm32():
-    O(p2b, 0x15, b)
-for b in modrm32():
-    O(pos, p2b, 0x15, b)
-for b in modrm16():
-    O(pas, p2b, 0x15, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x15, b)
-
-
-# (MOVLHPS|MOVHPS|MOVHPD|MOVHDUP)
-for b in modrm32():
-    O(p2b, 0x16, b)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, p2b, 0x16, b)
-for b in modrm32():
-    O(psp, p2b, 0x16, b)
-for b in modrm16():
-    O(pas, p2b, 0x16, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, p2b, 0x16, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x16, b)
-
-
-# (MOVHPS|MOVHPD)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(p2b, 0x17, b)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, p2b, 0x17, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, p2b, 0x17, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, p2b, 0x17, b)
-
-
-# (PREFETCHNTA|PREFETCH0|PREFETCH1|PREFETCH2)
-for b in modrm32(modonly=[0, 1, 2], regonly=[0, 1, 2, 3]):
-    O(p2b, 0x18, b)
-for b in modrm16(modonly=[0, 1, 2], regonly=[0, 1, 2, 3]):
-    O(pas, p2b, 0x18, b)
-# HINT_NOP
-for b in modrm32(regonly=[4, 5, 6, 7]):
-    O(p2b, 0x18, b)
-for b in modrm32(regonly=[4, 5, 6, 7]):
-    O(pos, p2b, 0x18, b)
-for b in modrm16(regonly=[4, 5, 6, 7]):
-    O(pas, p2b, 0x18, b)
-for b in modrm16(regonly=[4, 5, 6, 7]):
-    O(pas, pos, p2b, 0x18, b)
-
-
-# HINT_NOP
-for b in modrm32():
-    O(p2b, 0x19, b)
-for b in modrm32():
-    O(pos, p2b, 0x19, b)
-for b in modrm16():
-    O(pas, p2b, 0x19, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x19, b)
-
-
-# NOTE: It gets a bit weird here just do things supported by Capstone
-# HINT_NOP
-for b in modrm32(modonly=[0, 1, 2]):
-    O(p2b, 0x1a, b)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, p2b, 0x1a, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, p2b, 0x1a, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, p2b, 0x1a, b)
-
-
-# NOTE: It gets a bit weird here just do things supported by Capstone
-# HINT_NOP
-for b in modrm32(modonly=[0, 1, 2]):
-    O(p2b, 0x1b, b)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, p2b, 0x1b, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, p2b, 0x1b, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, p2b, 0x1b, b)
-
-
-# NOTE: It gets a bit weird here just do things supported by Capstone
-# HINT_NOP
-for b in modrm32(modonly=[0, 1, 2]):
-    O(p2b, 0x1c, b)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, p2b, 0x1c, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, p2b, 0x1c, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, p2b, 0x1c, b)
-
-
-# NOTE: It gets a bit weird here just do things supported by Capstone
-# HINT_NOP
-for b in modrm32(modonly=[0, 1, 2]):
-    O(p2b, 0x1d, b)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, p2b, 0x1d, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, p2b, 0x1d, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, p2b, 0x1d, b)
-
-
-# NOTE: It gets a bit weird here just do things supported by Capstone
-# HINT_NOP
-for b in modrm32(modonly=[0, 1, 2]):
-    O(p2b, 0x1e, b)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, p2b, 0x1e, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, p2b, 0x1e, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, p2b, 0x1e, b)
-
-
-# NOTE: It gets a bit weird here just do things supported by Capstone
-# HINT_NOP
-for b in modrm32(modonly=[0, 1, 2]):
-    O(p2b, 0x1f, b)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, p2b, 0x1f, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, p2b, 0x1f, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, p2b, 0x1f, b)
-
-
-# NOTE: not really modrm, since mod 00, 01, 10 map to 11
-# MOV r32, CRn
-for b in range(0xff + 1):
-    O(p2b, 0x20, b)
-
-
-# NOTE: not really modrm, since mod 00, 01, 10 map to 11
-# MOV r32, DRn
-for b in range(0xff + 1):
-    O(p2b, 0x21, b)
-
-
-# NOTE: not really modrm, since mod 00, 01, 10 map to 11
-# MOV CRn, r32
-for b in range(0xff + 1):
-    O(p2b, 0x22, b)
-
-
-# NOTE: not really modrm, since mod 00, 01, 10 map to 11
-# MOV DRn, r32
-for b in range(0xff + 1):
-    O(p2b, 0x23, b)
-
-
-# 0x0f 0x24-0x27 NA
-
-
-# (MOVAPS|MOVAPD) xmm, xmm/m128
-for b in modrm32():
-    O(p2b, 0x28, b)
-for b in modrm32():
-    O(pos, p2b, 0x28, b)
-for b in modrm16():
-    O(pas, p2b, 0x28, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x28, b)
-
-
-# (MOVAPS|MOVAPD) xmm/m128, xmm
-for b in modrm32():
-    O(p2b, 0x29, b)
-for b in modrm32():
-    O(pos, p2b, 0x29, b)
-for b in modrm16():
-    O(pas, p2b, 0x29, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x29, b)
-
-
-# (CVTPI2PS|CVTSI2SS|CVTPI2PD|CVTSI2SD)
-for b in modrm32():
-    O(p2b, 0x2a, b)
-for b in modrm32():
-    O(pos, p2b, 0x2a, b)
-for b in modrm32():
-    O(psp, p2b, 0x2a, b)
-for b in modrm32():
-    O(pdp, p2b, 0x2a, b)
-for b in modrm16():
-    O(pas, p2b, 0x2a, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x2a, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x2a, b)
-for b in modrm16():
-    O(pas, pdp, p2b, 0x2a, b)
-
-
-# (MOVNTPS|MOVNTPD)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(p2b, 0x2b, b)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, p2b, 0x2b, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, p2b, 0x2b, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, p2b, 0x2b, b)
-
-
-# (CVTTPS2PI|CVTTSS2SI|CVTTPD2PI|CVTTSD2SI)
-for b in modrm32():
-    O(p2b, 0x2c, b)
-for b in modrm32():
-    O(pos, p2b, 0x2c, b)
-for b in modrm32():
-    O(psp, p2b, 0x2c, b)
-for b in modrm32():
-    O(pdp, p2b, 0x2c, b)
-for b in modrm16():
-    O(pas, p2b, 0x2c, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x2c, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x2c, b)
-for b in modrm16():
-    O(pas, pdp, p2b, 0x2c, b)
-
-
-# (CVTPS2PI|CVTSS2SI|CVTPD2PI|CVTSD2SI)
-for b in modrm32():
-    O(p2b, 0x2d, b)
-for b in modrm32():
-    O(pos, p2b, 0x2d, b)
-for b in modrm32():
-    O(psp, p2b, 0x2d, b)
-for b in modrm32():
-    O(pdp, p2b, 0x2d, b)
-for b in modrm16():
-    O(pas, p2b, 0x2d, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x2d, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x2d, b)
-for b in modrm16():
-    O(pas, pdp, p2b, 0x2d, b)
-
-
-# (UCOMISS|UCOMISD)
-for b in modrm32():
-    O(p2b, 0x2e, b)
-for b in modrm32():
-    O(pos, p2b, 0x2e, b)
-for b in modrm16():
-    O(pas, p2b, 0x2e, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x2e, b)
-
-
-# (COMISS|COMISD)
-for b in modrm32():
-    O(p2b, 0x2f, b)
-for b in modrm32():
-    O(pos, p2b, 0x2f, b)
-for b in modrm16():
-    O(pas, p2b, 0x2f, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x2f, b)
-
-
-# WRMSR
-O(p2b, 0x30)
-
-
-# RDTSC
-O(p2b, 0x31)
-
-
-# RDMSR
-O(p2b, 0x32)
-
-
-# RDPMC
-O(p2b, 0x33)
-
-
-# SYSENTER
-O(p2b, 0x34)
-
-
-# SYSEXIT
-O(p2b, 0x35)
-
-
-# 0x0f 0x36 NA
-
-
-# GETSEC
-O(p2b, 0x37)
-
-
-# NOTE: Variation on modrm for 0x0f 0x39 (byte + modrm)
-# (PSHUFB|PHADDW|PHADDD|PHADDSW|PMADDUBSW|PHSUBW|PHSUBD|PHSUBSW|PSIGNB|PSIGNW|PSIGND|PMULHRSW)
-for o in range(0x0b + 1):
-    for b in modrm32():
-        O(p2b, 0x38, o, b)
-    for b in modrm32():
-        O(pos, p2b, 0x38, o, b)
-    for b in modrm16():
-        O(pas, p2b, 0x38, o, b)
-    for b in modrm16():
-        O(pas, pos, p2b, 0x38, o, b)
-# (PBLENDVB|BLENDVPS|BLENDVPD|PTEST)
-for o in (0x10, 0x14, 0x15, 0x17):
-    for b in modrm32():
-        O(pos, p2b, 0x38, o, b)
-    for b in modrm16():
-        O(pas, pos, p2b, 0x38, o, b)
-# (PABSB|PABSW|PABSD)
-for o in range(0x1c, 0x1e + 1):
-    for b in modrm32():
-        O(p2b, 0x38, o, b)
-    for b in modrm32():
-        O(pos, p2b, 0x38, o, b)
-    for b in modrm16():
-        O(pas, p2b, 0x38, o, b)
-    for b in modrm16():
-        O(pas, pos, p2b, 0x38, o, b)
-# (PMOVSXBW|PMOVSXBD|PMOVSXBQ|PMOVSXWD|PMOVSXWQ|PMOVSXDQ)
-for o in range(0x20, 0x25 + 1):
-    for b in modrm32():
-        O(pos, p2b, 0x38, o, b)
-    for b in modrm16():
-        O(pas, pos, p2b, 0x38, o, b)
-# (PMULDQ|PCMPEQQ)
-for o in (0x28, 0x29):
-    for b in modrm32():
-        O(pos, p2b, 0x38, o, b)
-    for b in modrm16():
-        O(pas, pos, p2b, 0x38, o, b)
-# MOVNTDQA
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, p2b, 0x38, 0x2a, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, p2b, 0x38, 0x2a, b)
-# PACKUSDW
-for b in modrm32():
-    O(pos, p2b, 0x38, 0x2b, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x38, 0x2b, b)
-# (PMOVZXBW|PMOVZXBD|PMOVZXBQ|PMOVZXWD|PMOVZXWQ|PMOVZXDQ)
-for o in range(0x30, 0x35 + 1):
-    for b in modrm32():
-        O(pos, p2b, 0x38, o, b)
-    for b in modrm16():
-        O(pas, pos, p2b, 0x38, o, b)
-# (PCMPGTQ|PMINSB|PMINSD|PMINUW|PMINUD|PMAXSB|PMAXSD|PMAXUW|PMAXUD|PMULLD|PHMINPOSUW)
-for o in range(0x37, 0x41 + 1):
-    for b in modrm32():
-        O(pos, p2b, 0x38, o, b)
-    for b in modrm16():
-        O(pas, pos, p2b, 0x38, o, b)
-# (INVEPT|INVVPID)
-for o in (0x80, 0x81):
-    for b in modrm32(modonly=[0, 1, 2]):
-        O(pos, p2b, 0x38, o, b)
-    for b in modrm16(modonly=[0, 1, 2]):
-        O(pas, pos, p2b, 0x38, o, b)
-# MOVBE r16/32, m16/32
-for b in modrm32(modonly=[0, 1, 2]):
-    O(p2b, 0x38, 0xf0, b)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, p2b, 0x38, 0xf0, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, p2b, 0x38, 0xf0, b)
-# CRC32 r32, r/m8
-for b in modrm32():
-    O(pdp, p2b, 0x38, 0xf0, b)
-for b in modrm16():
-    O(pas, pdp, p2b, 0x38, 0xf0, b)
-# MOVBE m16/32, r16/32
-for b in modrm32(modonly=[0, 1, 2]):
-    O(p2b, 0x38, 0xf1, b)
-for b in modrm32(modonly=[0, 1, 2]):
-    O(pos, p2b, 0x38, 0xf1, b)
-for b in modrm16(modonly=[0, 1, 2]):
-    O(pas, pos, p2b, 0x38, 0xf1, b)
-# CRC32 r32, r/m16/32
-for b in modrm32():
-    O(pdp, p2b, 0x38, 0xf1, b)
-for b in modrm16():
-    O(pas, pdp, p2b, 0x38, 0xf1, b)
-
-
-# NOTE: 0x0f 0x39 NA
-
-
-# NOTE: Variation on modrm for 0x0f 0x3a (byte + modrm)
-# (ROUNDPS|ROUNDPD|ROUNDSS|ROUNDSD|BLENDPS|BLENDPD|PBLENDW)
-for o in range(0x08, 0x0e + 1):
-    for b in modrm32():
-        O(pos, p2b, 0x3a, o, b, imm8)
-    for b in modrm16():
-        O(pas, pos, p2b, 0x3a, o, b, imm8)
-# PALIGNR
-for b in modrm32():
-    O(p2b, 0x3a, 0x0f, b, imm8)
-for b in modrm32():
-    O(pos, p2b, 0x3a, 0x0f, b, imm8)
-for b in modrm16():
-    O(pas, p2b, 0x3a, 0x0f, b, imm8)
-for b in modrm16():
-    O(pas, pos, p2b, 0x3a, 0x0f, b, imm8)
-# (PEXTRB|PEXTRW|PEXTRD|EXTRACTPS)
-for o in range(0x14, 0x17 + 1):
-    for b in modrm32():
-        O(pos, p2b, 0x3a, o, b, imm8)
-    for b in modrm16():
-        O(pas, pos, p2b, 0x3a, o, b, imm8)
-# (PINSRB|INSERTPS|PINSRD)
-for o in range(0x20, 0x22 + 1):
-    for b in modrm32():
-        O(pos, p2b, 0x3a, o, b, imm8)
-    for b in modrm16():
-        O(pas, pos, p2b, 0x3a, o, b, imm8)
-# (DPPS|DPPD|MPSADBW)
-for o in range(0x40, 0x42 + 1):
-    for b in modrm32():
-        O(pos, p2b, 0x3a, o, b, imm8)
-    for b in modrm16():
-        O(pas, pos, p2b, 0x3a, o, b, imm8)
-# (PCMPESTRM|PCMPESTRI|PCMPISTRM|PCMPISTRI)
-for o in range(0x60, 0x63 + 1):
-    for b in modrm32():
-        O(pos, p2b, 0x3a, o, b, imm8)
-    for b in modrm16():
-        O(pas, pos, p2b, 0x3a, o, b, imm8)
-
-
-# NOTE: 0x0f 0x3b-0x3f NA
-
-
-# (CMOVO|CMOVNO|CMOVB|CMOVNB|CMOVZ|CMOVNZ|CMOVBE|CMOVNBE|CMOVS|CMOVNS|CMOVP|CMOVNP|CMOVL|CMOVNL|CMOVLE|CMOVNLE)
-for op in range(0x40, 0x4f + 1):
-    for b in modrm32():
-        O(p2b, op, b)
-    for b in modrm32():
-        O(pos, p2b, op, b)
-    for b in modrm16():
-        O(pas, p2b, op, b)
-    for b in modrm16():
-        O(pas, pos, p2b, op, b)
-
-
-# (MOVMSKPS|MOVMSKPD)
-for b in modrm32(modonly=[3]):
-    O(p2b, 0x50, b)
-for b in modrm32(modonly=[3]):
-    O(pos, p2b, 0x50, b)
-
-
-# (SQRTPS|SQRTSS|SQRTPD|SQRTSD)
-for b in modrm32():
-    O(p2b, 0x51, b)
-for b in modrm32():
-    O(pos, p2b, 0x51, b)
-for b in modrm32():
-    O(pdp, p2b, 0x51, b)
-for b in modrm32():
-    O(psp, p2b, 0x51, b)
-for b in modrm16():
-    O(pas, p2b, 0x51, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x51, b)
-for b in modrm16():
-    O(pas, pdp, p2b, 0x51, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x51, b)
-
-
-# (RSQRTPS|RSQRTSS)
-for b in modrm32():
-    O(p2b, 0x52, b)
-for b in modrm32():
-    O(psp, p2b, 0x52, b)
-for b in modrm16():
-    O(pas, p2b, 0x52, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x52, b)
-
-
-# (RCPPS|RCPSS)
-for b in modrm32():
-    O(p2b, 0x53, b)
-for b in modrm32():
-    O(psp, p2b, 0x53, b)
-for b in modrm16():
-    O(pas, p2b, 0x53, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x53, b)
-
-
-# (ANDPS|ANDPD)
-for b in modrm32():
-    O(p2b, 0x54, b)
-for b in modrm32():
-    O(pos, p2b, 0x54, b)
-for b in modrm16():
-    O(pas, p2b, 0x54, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x54, b)
-
-
-# (ANDNPS|ANDNPD)
-for b in modrm32():
-    O(p2b, 0x55, b)
-for b in modrm32():
-    O(pos, p2b, 0x55, b)
-for b in modrm16():
-    O(pas, p2b, 0x55, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x55, b)
-
-
-# (ORPS|ORPD)
-for b in modrm32():
-    O(p2b, 0x56, b)
-for b in modrm32():
-    O(pos, p2b, 0x56, b)
-for b in modrm16():
-    O(pas, p2b, 0x56, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x56, b)
-
-
-# (XORPS|XORPD)
-for b in modrm32():
-    O(p2b, 0x57, b)
-for b in modrm32():
-    O(pos, p2b, 0x57, b)
-for b in modrm16():
-    O(pas, p2b, 0x57, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x57, b)
-
-
-# (ADDPS|ADDSS|ADDPD|ADDSD)
-for b in modrm32():
-    O(p2b, 0x58, b)
-for b in modrm32():
-    O(pos, p2b, 0x58, b)
-for b in modrm32():
-    O(pdp, p2b, 0x58, b)
-for b in modrm32():
-    O(psp, p2b, 0x58, b)
-for b in modrm16():
-    O(pas, p2b, 0x58, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x58, b)
-for b in modrm16():
-    O(pas, pdp, p2b, 0x58, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x58, b)
-
-
-# (MULPS|MULSS|MULPD|MULSD)
-for b in modrm32():
-    O(p2b, 0x59, b)
-for b in modrm32():
-    O(pos, p2b, 0x59, b)
-for b in modrm32():
-    O(pdp, p2b, 0x59, b)
-for b in modrm32():
-    O(psp, p2b, 0x59, b)
-for b in modrm16():
-    O(pas, p2b, 0x59, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x59, b)
-for b in modrm16():
-    O(pas, pdp, p2b, 0x59, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x59, b)
-
-
-# (CVTPS2PD|CVTPD2PS|CVTSS2SD|CVTSD2SS)
-for b in modrm32():
-    O(p2b, 0x5a, b)
-for b in modrm32():
-    O(pos, p2b, 0x5a, b)
-for b in modrm32():
-    O(pdp, p2b, 0x5a, b)
-for b in modrm32():
-    O(psp, p2b, 0x5a, b)
-for b in modrm16():
-    O(pas, p2b, 0x5a, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x5a, b)
-for b in modrm16():
-    O(pas, pdp, p2b, 0x5a, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x5a, b)
-
-
-# (CVTDQ2PS|CVTPS2DQ|CVTTPS2DQ)
-for b in modrm32():
-    O(p2b, 0x5b, b)
-for b in modrm32():
-    O(pos, p2b, 0x5b, b)
-for b in modrm32():
-    O(psp, p2b, 0x5b, b)
-for b in modrm16():
-    O(pas, p2b, 0x5b, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x5b, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x5b, b)
-
-
-# (SUBPS|SUBSS|SUBPD|SUBSD)
-for b in modrm32():
-    O(p2b, 0x5c, b)
-for b in modrm32():
-    O(pos, p2b, 0x5c, b)
-for b in modrm32():
-    O(pdp, p2b, 0x5c, b)
-for b in modrm32():
-    O(psp, p2b, 0x5c, b)
-for b in modrm16():
-    O(pas, p2b, 0x5c, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x5c, b)
-for b in modrm16():
-    O(pas, pdp, p2b, 0x5c, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x5c, b)
-
-
-# (MINPS|MINSS|MINPD|MINSD)
-for b in modrm32():
-    O(p2b, 0x5d, b)
-for b in modrm32():
-    O(pos, p2b, 0x5d, b)
-for b in modrm32():
-    O(pdp, p2b, 0x5d, b)
-for b in modrm32():
-    O(psp, p2b, 0x5d, b)
-for b in modrm16():
-    O(pas, p2b, 0x5d, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x5d, b)
-for b in modrm16():
-    O(pas, pdp, p2b, 0x5d, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x5d, b)
-
-
-# (DIVPS|DIVSS|DIVPD|DIVSD)
-for b in modrm32():
-    O(p2b, 0x5e, b)
-for b in modrm32():
-    O(pos, p2b, 0x5e, b)
-for b in modrm32():
-    O(pdp, p2b, 0x5e, b)
-for b in modrm32():
-    O(psp, p2b, 0x5e, b)
-for b in modrm16():
-    O(pas, p2b, 0x5e, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x5e, b)
-for b in modrm16():
-    O(pas, pdp, p2b, 0x5e, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x5e, b)
-
-
-# (MAXPS|MAXSS|MAXPD|MAXSD)
-for b in modrm32():
-    O(p2b, 0x5f, b)
-for b in modrm32():
-    O(pos, p2b, 0x5f, b)
-for b in modrm32():
-    O(pdp, p2b, 0x5f, b)
-for b in modrm32():
-    O(psp, p2b, 0x5f, b)
-for b in modrm16():
-    O(pas, p2b, 0x5f, b)
-for b in modrm16():
-    O(pas, pos, p2b, 0x5f, b)
-for b in modrm16():
-    O(pas, pdp, p2b, 0x5f, b)
-for b in modrm16():
-    O(pas, psp, p2b, 0x5f, b)
+@cached(modrm16_shape, modrm16_operand)
+def modrm16(modonly=None, regonly=None):
+    for modrm, mod, rm in modrms(modonly, regonly):
+        yield modrm16_operand(modrm, mod, rm, 0)
+
+
+def modrm32_disp(mod, rm):
+    if mod == 0 and rm == 5:
+        return disp32
+    elif mod == 1:
+        return disp8
+    elif mod == 2:
+        return disp32
+    return []
+
+
+def modrm32_shape(mod, rm):
+    disp = len(modrm32_disp(mod, rm))
+    if mod < 3 and rm == 4:
+        # every SIB byte, the 0x20 with base 5 adding a disp32 when mod is 0
+        size = 0x100 * (2 + disp)
+        if mod == 0:
+            size += 0x20 * len(disp32)
+        return 0x100, size
+    return 1, 1 + disp
+
+
+def modrm32_operand(modrm, mod, rm, i):
+    '''The ModRM byte and displacement, with SIB byte `i` if there is one.'''
+    disp = modrm32_disp(mod, rm)
+    if mod < 3 and rm == 4:
+        if i & 7 == 5 and mod == 0:
+            return [modrm, i] + disp32
+        return [modrm, i] + disp
+    return [modrm] + disp
+
+
+@cached(modrm32_shape, modrm32_operand)
+def modrm32(modonly=None, regonly=None):
+    for modrm, mod, rm in modrms(modonly, regonly):
+        for i in range(modrm32_shape(mod, rm)[0]):
+            yield modrm32_operand(modrm, mod, rm, i)
+
+
+# Operands of the same length class take the same path through a length
+# decoder: the mod, whether the reg field is 0 or 1 (the TEST forms of 0xf6
+# and 0xf7 taking an immediate), the rm values with special cases and the SIB
+# base of 5.
+
+
+def modrm16_class(operand):
+    modrm = operand[0]
+    mod, reg, rm = modrm >> 6, (modrm >> 3) & 7, modrm & 7
+    return mod, reg & 6 == 0, rm == 6
+
+
+def modrm32_class(operand):
+    modrm = operand[0]
+    mod, reg, rm = modrm >> 6, (modrm >> 3) & 7, modrm & 7
+    base = operand[1] & 7 == 5 if mod < 3 and rm == 4 else None
+    return mod, reg & 6 == 0, rm if rm in (4, 5) else 0, base
+
+
+LENGTH_CLASSES = {
+    'modrm16': modrm16_class,
+    'modrm32': modrm32_class,
+}
+
+
+# The instruction space is described by OPCODES below, one entry per section:
+# its name followed by one or more rows. A row reads like an opcode column of
+# the Intel manual, optionally followed by the prefix combinations to emit it
+# with:
+#
+#     opcode bytes [operands] [| prefixes [| 16 bit address prefixes]]
+#
+# The last opcode byte may be a range (40-47) or a list (10,14,15,17). The
+# operands are an optional ModRM byte, /r for any reg field or /0124 for some,
+# with :m limiting it to memory (mod 0, 1 and 2) or :r to register (mod 3)
+# operands, and the immediates of IMMEDIATES. The prefixes (default -, none)
+# are 66, 67, f2, f3 or a combination such as 67+66, a :m or :r after one
+# limiting the ModRM byte of that combination.
+#
+# The forms of an opcode with a ModRM byte taking memory operands are followed
+# by the same forms with 0x67 and 16 bit addressing, for each of the 16 bit
+# address prefixes (by default the same as the others). A row with a ModRM
+# byte is emitted one opcode at a time, a row without one one prefix
+# combination at a time.
+
+
+# immediate operands with 32 and 16 bit operand size (0x66)
+IMMEDIATES = {
+    'ib': (imm8, imm8),
+    'iw': (imm16, imm16),
+    'iz': (imm32, imm16),
+    'rb': (rel8, rel8),
+    'rz': (rel32, rel16),
+    'mo': (moffs32, moffs32),
+    'pz': (ptr16_32, ptr16_16),
+}
+
+# the ModRM mod limits of :m and :r
+MODS = {'m': [0, 1, 2], 'r': [3]}
+
+
+def parse_prefixes(field):
+    '''The (prefix bytes, mod limit) of every combination of a prefix field.'''
+    combinations = []
+    for word in field.split():
+        combination, _, mod = word.partition(':')
+        prefixes = [] if combination == '-' else [
+            int(p, 16) for p in combination.split('+')]
+        combinations.append((prefixes, MODS.get(mod)))
+    return combinations
+
+
+def parse_row(row):
+    '''Split a row into its opcodes (as lists of bytes), ModRM
+    (modonly, regonly) or None, immediates and prefix combinations with 32
+    and 16 bit addressing.'''
+    fields = row.split('|')
+    words = fields[0].split()
+    prefixes = parse_prefixes(fields[1] if len(fields) > 1 else '-')
+    prefixes16 = parse_prefixes(fields[2]) if len(fields) > 2 else prefixes
+
+    head = []
+    while words and words[0][0] != '/' and words[0] not in IMMEDIATES:
+        head.append(words.pop(0))
+    last = head.pop()
+    if '-' in last:
+        first, end = (int(b, 16) for b in last.split('-'))
+        last = range(first, end + 1)
+    else:
+        last = [int(b, 16) for b in last.split(',')]
+    fixed = [int(b, 16) for b in head]
+    opcodes = [fixed + [b] for b in last]
+
+    modrm = None
+    if words and words[0][0] == '/':
+        regs, _, mod = words.pop(0)[1:].partition(':')
+        modrm = (MODS.get(mod), None if regs == 'r' else list(map(int, regs)))
+    return opcodes, modrm, words, prefixes, prefixes16
+
+
+def expand(row):
+    '''Yield the O() arguments of every form of a row.'''
+    opcodes, modrm, immediates, prefixes, prefixes16 = parse_row(row)
+
+    def tail(combination):
+        size = pos in combination
+        return [b for i in immediates for b in IMMEDIATES[i][size]]
+
+    if modrm is None:
+        for combination, _ in prefixes:
+            for opcode in opcodes:
+                yield combination + opcode + tail(combination)
+        return
+
+    modonly, regonly = modrm
+    for opcode in opcodes:
+        for combination, mod in prefixes:
+            block = modrm32(mod or modonly, regonly)
+            yield combination + opcode + [block] + tail(combination)
+        for combination, mod in prefixes16:
+            if (mod or modonly) == MODS['r']:
+                continue
+            block = modrm16(mod or modonly, regonly)
+            yield [pas] + combination + opcode + [block] + tail(combination)
+
+
+def build(table):
+    '''Add a Section of the forms of every entry of `table`.'''
+    for name, *rows in table:
+        S(name)
+        for row in rows:
+            for parts in expand(row):
+                O(*parts)
+
+
+OPCODES = [
+    ('ADD r/m8, r8', '00 /r'),
+    ('ADD r/m16/32, r16/32', '01 /r | - 66'),
+    ('ADD r8, r/m8', '02 /r'),
+    ('ADD r16/32, r/m16/32', '03 /r | - 66'),
+    ('ADD AL, imm8', '04 ib'),
+    ('ADD E?AX, imm16/32', '05 iz | - 66'),
+    ('PUSH ES', '06'),
+    ('POP ES', '07'),
+    ('OR r/m8, r8', '08 /r'),
+    ('OR r/m16/32, r16/32', '09 /r | - 66'),
+    ('OR r8, r/m8', '0a /r'),
+    ('OR r16/32, r/m16/32', '0b /r | - 66'),
+    ('OR AL, imm8', '0c ib'),
+    ('OR E?AX, imm16/32', '0d iz | - 66'),
+    ('PUSH CS', '0e'),
+
+    # 0x0f (2 byte instructions)
+
+    ('ADC r/m8, r8', '10 /r'),
+    ('ADC r/m16/32, r16/32', '11 /r | - 66'),
+    ('ADC r8, r/m8', '12 /r'),
+    ('ADC r16/32, r/m16/32', '13 /r | - 66'),
+    ('ADC AL, imm8', '14 ib'),
+    ('ADC E?AX, imm16/32', '15 iz | - 66'),
+    ('PUSH SS', '16'),
+    ('POP SS', '17'),
+    ('SBB r/m8, r8', '18 /r'),
+    ('SBB r/m16/32, r16/32', '19 /r | - 66'),
+    ('SBB r8, r/m8', '1a /r'),
+    ('SBB r16/32, r/m16/32', '1b /r | - 66'),
+    ('SBB AL, imm8', '1c ib'),
+    ('SBB E?AX, imm16/32', '1d iz | - 66'),
+    ('POP DS', '1e'),
+    ('POP DS', '1f'),
+    ('AND r/m8, r8', '20 /r'),
+    ('AND r/m16/32, r16/32', '21 /r | - 66'),
+    ('AND r8, r/m8', '22 /r'),
+    ('AND r16/32, r/m16/32', '23 /r | - 66'),
+    ('AND AL, imm8', '24 ib'),
+    ('AND E?AX, imm16/32', '25 iz | - 66'),
+
+    # 0x26 ES segment prefix
+
+    ('DAA', '27'),
+    ('SUB r/m8, r8', '28 /r'),
+    ('SUB r/m16/32, r16/32', '29 /r | - 66'),
+    ('SUB r8, r/m8', '2a /r'),
+    ('SUB r16/32, r/m16/32', '2b /r | - 66'),
+    ('SUB AL, imm8', '2c ib'),
+    ('SUB E?AX, imm16/32', '2d iz | - 66'),
+
+    # 0x2e CS segment prefix
+
+    ('DAS', '2f'),
+    ('XOR r/m8, r8', '30 /r'),
+    ('XOR r/m16/32, r16/32', '31 /r | - 66'),
+    ('XOR r8, r/m8', '32 /r'),
+    ('XOR r16/32 r/m16/32', '33 /r | - 66'),
+    ('XOR AL, imm8', '34 ib'),
+    ('XOR E?AX, imm16/32', '35 iz | - 66'),
+
+    # 0x36 SS segment prefix
+
+    ('AAA', '37'),
+    ('CMP r/m8, r8', '38 /r'),
+    ('CMP r/m16/32, r16/32', '39 /r | - 66'),
+    ('CMP r8, r/m8', '3a /r'),
+    ('CMP r16/32, r/m16/32', '3b /r | - 66'),
+    ('CMP AL, imm8', '3c ib'),
+    ('CMP E?AX, imm16/32', '3d iz | - 66'),
+
+    # 0x3e DS segment prefix
+
+    ('AAS', '3f'),
+    ('INC E?(AX|CX|DX|BX|SP|BP|SI|DI)', '40-47 | - 66'),
+    ('DEC E?(AX|CX|DX|BX|SP|BP|SI|DI)', '48-4f | - 66'),
+    ('PUSH E?(AX|CX|DX|BX|SP|BP|SI|DI)', '50-57 | - 66'),
+    ('POP E?(AX|CX|DX|BX|SP|BP|SI|DI)', '58-5f | - 66'),
+    ('PUSHAD?', '60 | - 66'),
+    ('POPAD?', '61 | - 66'),
+    ('BOUND r16/32, m16/32&16/32', '62 /r:m | - 66'),
+    ('ARPL r/m16, r16', '63 /r'),
+
+    # 0x64 FS segment prefix
+
+    # 0x65 GS segment prefix
+
+    # 0x66 Operand/Precision size override
+
+    # 0x67 Address size override
+
+    ('PUSH imm16/32', '68 iz | - 66'),
+    ('IMUL r16/32, r/m16/32, imm16/32', '69 /r iz | - 66'),
+    ('PUSH imm8', '6a ib'),
+    ('IMUL r16/32, r/m16/32, imm8', '6b /r ib | - 66'),
+    ('INS m8', '6c'),
+    ('INS m16/32', '6d | - 66'),
+    ('OUTS m8', '6e'),
+    ('OUTS m16/32', '6f | - 66'),
+    ('J(O|NO|C|NC|Z|NZ|NA|A|S|NS|PE|PO|L|NL|NG|G) rel8', '70-7f rb'),
+    ('(ADD|OR|ADC|SBB|AND|SUB|XOR|CMP) r/m8, imm8', '80 /r ib'),
+    ('(ADD|OR|ADC|SBB|AND|SUB|XOR|CMP) r/m16/32, imm16/32', '81 /r iz | - 66'),
+    ('(ADD|OR|ADC|SBB|AND|SUB|XOR|CMP) r/m8, imm8', '82 /r ib'),
+    ('(ADD|OR|ADC|SBB|AND|SUB|XOR|CMP) r/m16/32, imm8', '83 /r ib | - 66'),
+    ('TEST r/m8, r8', '84 /r'),
+    ('TEST r/m16/32, r16/32', '85 /r | - 66'),
+    ('XCHG r/m8, r8', '86 /r'),
+    ('XCHG r/m16/32, r16/32', '87 /r | - 66'),
+    ('MOV r/m8, r8', '88 /r'),
+    ('MOV r/m16/32, r16/32', '89 /r | - 66'),
+    ('MOV r8, r/m8', '8a /r'),
+    ('MOV r16/32, r/m16/32', '8b /r | - 66'),
+    ('MOV r/m16/32, Sreg', '8c /012345'),
+    ('LEA r16/32, m', '8d /r:m | - 66'),
+    ('MOV Sreg, r/m16', '8e /012345'),
+    ('POP r/m16/32', '8f /0 | - 66'),
+    ('XCHG E?AX, E?(AX|CX|DX|BX|SP|BP|SI|DI)', '90-97 | - 66'),
+    ('C(BW|WDE)', '98 | - 66'),
+    ('C(WD|DQ)', '99 | - 66'),
+    ('CALLF ptr16:16/32', '9a pz | - 66'),
+    ('WAIT', '9b'),
+    ('PUSHFD?', '9c | - 66'),
+    ('POPFD?', '9d | - 66'),
+    ('SAHF', '9e'),
+    ('LAHF', '9f'),
+    ('MOV AL, moffs8', 'a0 mo'),
+    ('MOV E?AX, moffs16/32', 'a1 mo | - 66'),
+    ('MOV moffs8, AL', 'a2 mo'),
+    ('MOV moffs16/32, E?AX', 'a3 mo | - 66'),
+    ('MOVSB', 'a4'),
+    ('MOVS(W|D)', 'a5 | - 66'),
+    ('CMPSB', 'a6'),
+    ('CMPS(W|D)', 'a7 | - 66'),
+    ('TEST AL, imm8', 'a8 ib'),
+    ('TEST E?AX, imm16/32', 'a9 iz | - 66'),
+    ('STOSB', 'aa'),
+    ('STOS(W|D)', 'ab | - 66'),
+    ('LODSB', 'ac'),
+    ('LODS(W|D)', 'ad | - 66'),
+    ('SCASB', 'ae'),
+    ('SCAS(W|D)', 'af | - 66'),
+    ('MOV (AL|CL|DL|BL|AH|CH|DH|BH), imm8', 'b0-b7 ib'),
+    ('MOV E?(AX|CX|DX|BX|SP|BP|SI|DI), imm16/32', 'b8-bf iz | - 66'),
+    ('(ROL|ROR|RCL|RCR|SHL|SHR|SAL|SAR) r/m8, imm8', 'c0 /r ib'),
+    ('(ROL|ROR|RCL|RCR|SHL|SHR|SAL|SAR) r/m16/32, imm8', 'c1 /r ib | - 66'),
+    ('RETN imm16', 'c2 iw'),
+    ('RETN', 'c3'),
+    ('LES ES, r16/32, m16:16/32', 'c4 /r:m | - 66'),
+    ('LDS DS, r16/32, m16:16/32', 'c5 /r:m | - 66'),
+    ('MOV r/m8, imm8', 'c6 /0 ib'),
+    ('MOV r/m16/32, imm16/32', 'c7 /0 iz | - 66'),
+    ('ENTER', 'c8 iw ib'),
+    ('LEAVE', 'c9'),
+    ('RETF imm16', 'ca iw'),
+    ('RETF', 'cb'),
+    ('INT3', 'cc'),
+    ('INT imm8', 'cd ib'),
+    ('INTO', 'ce'),
+    ('IRETD?', 'cf | - 66'),
+    ('(ROL|ROR|RCL|RCR|SHL|SHR|SAL|SAR) r/m8, 1', 'd0 /r'),
+    ('(ROL|ROR|RCL|RCR|SHL|SHR|SAL|SAR) r/m16/32, 1', 'd1 /r | - 66'),
+    ('(ROL|ROR|RCL|RCR|SHL|SHR|SAL|SAR) r/m8, CL', 'd2 /r'),
+    ('(ROL|ROR|RCL|RCR|SHL|SHR|SAL|SAR) r/m16/32, CL', 'd3 /r | - 66'),
+    ('AAM AL, AH(, imm8)?', 'd4 0a', 'd4 ib'),
+    ('AAD AL, AH(, imm8)?', 'd5 0a', 'd5 ib'),
+    ('SALC', 'd6'),
+    ('XLAT AL, m8', 'd7'),
+    ('(FADD|FMUL|FCOM|FCOMP|FSUB|FSUBR|FDIV|FDIVR) ST STi/m32real', 'd8 /r'),
+    ('FLD ST STi/m32real', 'd9 /0'),
+    ('FXCH ST, STi', 'd9 /1:r'),
+    ('FST m32real, ST', 'd9 /2:m'),
+    ('FNOP', 'd9 d0'),
+    ('FSTP STi/m32real, ST', 'd9 /3'),
+    ('FLDENV m14/28', 'd9 /4:m'),
+    ('FCHS ST', 'd9 e0'),
+    ('FABS ST', 'd9 e1'),
+    ('FTST ST', 'd9 e4'),
+    ('FXAM ST', 'd9 e5'),
+    ('FLDCW m16', 'd9 /5:m'),
+    ('FLD1 ST', 'd9 e8'),
+    ('FLDL2T ST', 'd9 e9'),
+    ('FLDL2E ST', 'd9 ea'),
+    ('FLDPI ST', 'd9 eb'),
+    ('FLDLG2 ST', 'd9 ec'),
+    ('FLDLN2 ST', 'd9 ed'),
+    ('FLDZ ST', 'd9 ee'),
+    ('FN?STENV m14/28', 'd9 /6:m'),
+    ('(F2XM1|FYL2X|FPTAN|FPATAN|FXTRACT|FPREM1|FDECSTP|FINCSTP)', 'd9 /6:r'),
+    ('FN?STCW m16', 'd9 /7:m'),
+    ('(FPREM|FYL2XP1|FSQRT|FSINCOS|FRNDINT|FSCALE|FSIN|FCOS)', 'd9 /7:r'),
+    ('(FIADD|FIMUL|FICOM|FICOMP|FISUB|FISUBR|FIDIV|FIDIVR) ST, m32int',
+     'da /r:m'),
+    ('(FCMOVB|FCMOVE|FCMOVBE|FCMOVU) ST, STi', 'da /0123:r'),
+    ('FUCOMPP ST, ST1', 'da e9'),
+    ('(FILD|FISTTP|FIST|FISTP|FCMOVNB|FCMOVNE|FCMOVENBE|FCMOVNU)', 'db /0123'),
+    ('FNENI', 'db e0'),
+    ('FNDISI', 'db e1'),
+    ('FNCLEX', 'db e2'),
+    ('FNINIT', 'db e3'),
+    ('FNSETPM', 'db e4'),
+    ('(FLD|FSTP)', 'db /57:m'),
+    ('(FUCOMI|FCOMI)', 'db /56:r'),
+    ('(FADD|FMUL|FCOM|FCOM2|FCOMP|FCOMP3|FSUB|FSUBR|FDIV|FDIVR)', 'dc /r'),
+    ('(FLD|FISTTP|FST|FSTP|FFREE|FXCH4)', 'dd /0123'),
+    ('(FRSTOR|FUCOM|FUCOMP)', 'dd /45:r'),
+    ('(FN?SAVE|FN?STSW)', 'dd /67:m'),
+    ('(FIADD|FIMUL|FICOM|FICOMP|FISUB|FISUBR|FIDIV|FIDIVR)', 'de /r:m'),
+    ('(FADDP|FMULP|FCOMP5|FSUBRP|FSUBP|FDIVRP|FDIVP)', 'de /0124567:r'),
+    ('FCOMPP', 'de d9'),
+    ('(FILD|FISTTP|FIST|FISTP|FBLD|FBSTP|FISTP)', 'df /r:m'),
+    ('(FFREEP|FXCH7|FSTP8|FSTP9|FUCOMIP|FCOMIP)', 'df /012356:r'),
+    ('FNSTSW', 'df e0'),
+    ('LOOPNZ E?CX, rel8', 'e0 rb | - 67'),
+    ('LOOPZ E?CX, rel8', 'e1 rb | - 67'),
+    ('LOOP E?CX, rel8', 'e2 rb | - 67'),
+    ('JCXZ rel8, E?CX', 'e3 rb | - 67'),
+    ('IN AL, imm8', 'e4 ib'),
+    ('IN E?AX, imm8', 'e5 ib | - 66'),
+    ('OUT imm8, AL', 'e6 ib'),
+    ('OUT imm8, E?AX', 'e7 ib | - 66'),
+    ('CALL rel16/32', 'e8 rz | - 66'),
+    ('JMP rel16/32', 'e9 rz | - 66'),
+    ('JMPF ptr16:16/32', 'ea pz | - 66'),
+    ('JMP rel8', 'eb rb'),
+    ('IN AL, DX', 'ec'),
+    ('IN E?AX, DX', 'ed | - 66'),
+    ('OUT DX, AL', 'ee'),
+    ('OUT DX, E?AX', 'ef | - 66'),
+
+    # 0xf0 Lock prefix
+
+    ('INT1', 'f1'),
+
+    # 0xf2 (REPNZ|REP) Repeat string operation or Scalar double-precision
+    # prefix
+
+    # 0xf3 (REPZ|REP) Repeat string operation or Scalar single-precision prefix
+
+    ('HALT', 'f4'),
+    ('CMC', 'f5'),
+    ('TEST r/m8, imm8', 'f6 /01 ib'),
+    ('(NOT|NEG|MUL|IMUL|DIV|IDIV)', 'f6 /234567'),
+    ('TEST r/m16/32, imm16/32', 'f7 /01 iz | - 66'),
+    ('(NOT|NEG|MUL|IMUL|DIV|IDIV)', 'f7 /234567 | - 66'),
+    ('CLC', 'f8'),
+    ('STC', 'f9'),
+    ('CLI', 'fa'),
+    ('STI', 'fb'),
+    ('CLD', 'fc'),
+    ('STD', 'fd'),
+    ('(INC|DEC) r/m8', 'fe /01'),
+    ('(INC|DEC|CALL|JMP|PUSH) r/m16/32', 'ff /01246 | - 66'),
+    ('(CALLF|JMPF) m16:16/32', 'ff /35:m | - 66'),
+    ('(SLDT|STR|LLDT|LTR|VERR|VERW)', '0f 00 /012345'),
+    ('SGDT', '0f 01 /0:m'),
+    ('VMCALL', '0f 01 c1'),
+    ('VMLAUNCH', '0f 01 c2'),
+    ('VMRESUME', '0f 01 c3'),
+    ('VMXOFF', '0f 01 c4'),
+    ('SIDT', '0f 01 /1:m'),
+    ('MONITOR', '0f 01 c8'),
+    ('MWAIT', '0f 01 c9'),
+    ('CLAC', '0f 01 ca'),
+    ('STAC', '0f 01 ca'),
+    ('LGDT', '0f 01 /2:m'),
+    ('XGETBV', '0f 01 d0'),
+    ('XSETBV', '0f 01 d1'),
+    ('(LIDT|VMRUN|VMMCALL|VMLOAD|VMSAVE|STGI|CLGI|SKINIT|INVLPGA)',
+     '0f 01 /3:m'),
+    ('SMSW', '0f 01 /4'),
+    ('LMSW', '0f 01 /6'),
+    ('INVLPG', '0f 01 /7:m'),
+    ('SWAPGS', '0f 01 f8'),
+    ('RTDSCP', '0f 01 f9'),
+    ('LAR', '0f 02 /r | - 66'),
+    ('LSL', '0f 03 /r | - 66'),
+
+    # 0x0f 0x04 NA
+
+    # 0x0f 0x05 NA
+
+    ('CLTS', '0f 06'),
+
+    # 0x0f 0x07 NA
+
+    ('INVD', '0f 08'),
+    ('WBINVD', '0f 09'),
+
+    # 0x0f 0x0a NA
+
+    ('UD2', '0f 0b'),
+
+    # 0x0f 0x0c NA
+
+    # Capstone doesn't disassemble this so we'll skip it
+    # ('(PREFETCH|PREFETCHW|PREFETCHWT1)', '0f 0d /012:m'),
+
+    ('FEMMS', '0f 0e'),
+
+    # 0x0f 0x0f Reserved
+
+    ('(MOVUPS|MOVSS|MOVUPD|MOVSD) xmm, xmm/m32/64/218',
+     '0f 10 /r | - 66 f3 f2'),
+    ('(MOVUPS|MOVSS|MOVUPD|MOVSD) xmm/m32/64/218, xmm',
+     '0f 11 /r | - 66 f3 f2'),
+    ('(MOVHLPS|MOVLPS|MOVLPD|MOVDDUP|MOVSLDUP)', '0f 12 /r | - 66:m f3 f2'),
+    ('(MOVLPS|MOVLPD)', '0f 13 /r:m | - 66'),
+    ('(UNPCKLPS|UNPCKLPD)', '0f 14 /r | - 66'),
+    ('(UNPCKHPS|UNPCKHPD)', '0f 15 /r | - 66'),
+    ('(MOVLHPS|MOVHPS|MOVHPD|MOVHDUP)', '0f 16 /r | - 66:m f3'),
+    ('(MOVHPS|MOVHPD)', '0f 17 /r:m | - 66'),
+    ('(PREFETCHNTA|PREFETCH0|PREFETCH1|PREFETCH2)', '0f 18 /0123:m'),
+    ('HINT_NOP', '0f 18 /4567 | - 66'),
+    ('HINT_NOP', '0f 19 /r | - 66'),
+
+    # NOTE: It gets a bit weird here just do things supported by Capstone
+    ('HINT_NOP', '0f 1a /r:m | - 66'),
+
+    # NOTE: It gets a bit weird here just do things supported by Capstone
+    ('HINT_NOP', '0f 1b /r:m | - 66'),
+
+    # NOTE: It gets a bit weird here just do things supported by Capstone
+    ('HINT_NOP', '0f 1c /r:m | - 66'),
+
+    # NOTE: It gets a bit weird here just do things supported by Capstone
+    ('HINT_NOP', '0f 1d /r:m | - 66'),
+
+    # NOTE: It gets a bit weird here just do things supported by Capstone
+    ('HINT_NOP', '0f 1e /r:m | - 66'),
+
+    # NOTE: It gets a bit weird here just do things supported by Capstone
+    ('HINT_NOP', '0f 1f /r:m | - 66'),
+
+    # NOTE: not really modrm, since mod 00, 01, 10 map to 11
+    ('MOV r32, CRn', '0f 20 00-ff'),
+
+    # NOTE: not really modrm, since mod 00, 01, 10 map to 11
+    ('MOV r32, DRn', '0f 21 00-ff'),
+
+    # NOTE: not really modrm, since mod 00, 01, 10 map to 11
+    ('MOV CRn, r32', '0f 22 00-ff'),
+
+    # NOTE: not really modrm, since mod 00, 01, 10 map to 11
+    ('MOV DRn, r32', '0f 23 00-ff'),
+
+    # 0x0f 0x24-0x27 NA
+
+    ('(MOVAPS|MOVAPD) xmm, xmm/m128', '0f 28 /r | - 66'),
+    ('(MOVAPS|MOVAPD) xmm/m128, xmm', '0f 29 /r | - 66'),
+    ('(CVTPI2PS|CVTSI2SS|CVTPI2PD|CVTSI2SD)', '0f 2a /r | - 66 f3 f2'),
+    ('(MOVNTPS|MOVNTPD)', '0f 2b /r:m | - 66'),
+    ('(CVTTPS2PI|CVTTSS2SI|CVTTPD2PI|CVTTSD2SI)', '0f 2c /r | - 66 f3 f2'),
+    ('(CVTPS2PI|CVTSS2SI|CVTPD2PI|CVTSD2SI)', '0f 2d /r | - 66 f3 f2'),
+    ('(UCOMISS|UCOMISD)', '0f 2e /r | - 66'),
+    ('(COMISS|COMISD)', '0f 2f /r | - 66'),
+    ('WRMSR', '0f 30'),
+    ('RDTSC', '0f 31'),
+    ('RDMSR', '0f 32'),
+    ('RDPMC', '0f 33'),
+    ('SYSENTER', '0f 34'),
+    ('SYSEXIT', '0f 35'),
+
+    # 0x0f 0x36 NA
+
+    ('GETSEC', '0f 37'),
+
+    # NOTE: Variation on modrm for 0x0f 0x39 (byte + modrm)
+    ('(PSHUFB|PHADDW|PHADDD|PHADDSW|PMADDUBSW|PHSUBW|PHSUBD|PHSUBSW|PSIGNB|'
+     'PSIGNW|PSIGND|PMULHRSW)',
+     '0f 38 00-0b /r | - 66'),
+    ('(PBLENDVB|BLENDVPS|BLENDVPD|PTEST)', '0f 38 10,14,15,17 /r | 66'),
+    ('(PABSB|PABSW|PABSD)', '0f 38 1c-1e /r | - 66'),
+    ('(PMOVSXBW|PMOVSXBD|PMOVSXBQ|PMOVSXWD|PMOVSXWQ|PMOVSXDQ)',
+     '0f 38 20-25 /r | 66'),
+    ('(PMULDQ|PCMPEQQ)', '0f 38 28,29 /r | 66'),
+    ('MOVNTDQA', '0f 38 2a /r:m | 66'),
+    ('PACKUSDW', '0f 38 2b /r | 66'),
+    ('(PMOVZXBW|PMOVZXBD|PMOVZXBQ|PMOVZXWD|PMOVZXWQ|PMOVZXDQ)',
+     '0f 38 30-35 /r | 66'),
+    ('(PCMPGTQ|PMINSB|PMINSD|PMINUW|PMINUD|PMAXSB|PMAXSD|PMAXUW|PMAXUD|'
+     'PMULLD|PHMINPOSUW)',
+     '0f 38 37-41 /r | 66'),
+    ('(INVEPT|INVVPID)', '0f 38 80,81 /r:m | 66'),
+    ('MOVBE r16/32, m16/32', '0f 38 f0 /r:m | - 66 | 66'),
+    ('CRC32 r32, r/m8', '0f 38 f0 /r | f2'),
+    ('MOVBE m16/32, r16/32', '0f 38 f1 /r:m | - 66 | 66'),
+    ('CRC32 r32, r/m16/32', '0f 38 f1 /r | f2'),
+
+    # NOTE: 0x0f 0x39 NA
+
+    # NOTE: Variation on modrm for 0x0f 0x3a (byte + modrm)
+    ('(ROUNDPS|ROUNDPD|ROUNDSS|ROUNDSD|BLENDPS|BLENDPD|PBLENDW)',
+     '0f 3a 08-0e /r ib | 66'),
+    ('PALIGNR', '0f 3a 0f /r ib | - 66'),
+    ('(PEXTRB|PEXTRW|PEXTRD|EXTRACTPS)', '0f 3a 14-17 /r ib | 66'),
+    ('(PINSRB|INSERTPS|PINSRD)', '0f 3a 20-22 /r ib | 66'),
+    ('(DPPS|DPPD|MPSADBW)', '0f 3a 40-42 /r ib | 66'),
+    ('(PCMPESTRM|PCMPESTRI|PCMPISTRM|PCMPISTRI)', '0f 3a 60-63 /r ib | 66'),
+
+    # NOTE: 0x0f 0x3b-0x3f NA
+
+    ('(CMOVO|CMOVNO|CMOVB|CMOVNB|CMOVZ|CMOVNZ|CMOVBE|CMOVNBE|CMOVS|CMOVNS|'
+     'CMOVP|CMOVNP|CMOVL|CMOVNL|CMOVLE|CMOVNLE)',
+     '0f 40-4f /r | - 66'),
+    ('(MOVMSKPS|MOVMSKPD)', '0f 50 /r:r | - 66'),
+    ('(SQRTPS|SQRTSS|SQRTPD|SQRTSD)', '0f 51 /r | - 66 f2 f3'),
+    ('(RSQRTPS|RSQRTSS)', '0f 52 /r | - f3'),
+    ('(RCPPS|RCPSS)', '0f 53 /r | - f3'),
+    ('(ANDPS|ANDPD)', '0f 54 /r | - 66'),
+    ('(ANDNPS|ANDNPD)', '0f 55 /r | - 66'),
+    ('(ORPS|ORPD)', '0f 56 /r | - 66'),
+    ('(XORPS|XORPD)', '0f 57 /r | - 66'),
+    ('(ADDPS|ADDSS|ADDPD|ADDSD)', '0f 58 /r | - 66 f2 f3'),
+    ('(MULPS|MULSS|MULPD|MULSD)', '0f 59 /r | - 66 f2 f3'),
+    ('(CVTPS2PD|CVTPD2PS|CVTSS2SD|CVTSD2SS)', '0f 5a /r | - 66 f2 f3'),
+    ('(CVTDQ2PS|CVTPS2DQ|CVTTPS2DQ)', '0f 5b /r | - 66 f3'),
+    ('(SUBPS|SUBSS|SUBPD|SUBSD)', '0f 5c /r | - 66 f2 f3'),
+    ('(MINPS|MINSS|MINPD|MINSD)', '0f 5d /r | - 66 f2 f3'),
+    ('(DIVPS|DIVSS|DIVPD|DIVSD)', '0f 5e /r | - 66 f2 f3'),
+    ('(MAXPS|MAXSS|MAXPD|MAXSD)', '0f 5f /r | - 66 f2 f3'),
+]
+
+
+build(OPCODES)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='write to FILE instead of stdout')
+    parser.add_argument('-b', '--buffer-size', metavar='BYTES', type=int,
+                        default=1 << 20,
+                        help='flush threshold (default: 1MiB)')
+    parser.add_argument('-l', '--lengths', metavar='FILE',
+                        help='also write the length of every instruction to '
+                        'FILE as one uint8 per instruction')
+    parser.add_argument('-B', '--bitmap', metavar='FILE',
+                        help='also write a bitmap of the instruction starts '
+                        'to FILE, one bit per byte (see x86bitmap.py)')
+    parser.add_argument('-i', '--index', metavar='FILE',
+                        help='also write a JSON index of the byte offset, '
+                        'size, instruction ordinal and count of every '
+                        'section to FILE')
+    parser.add_argument('-j', '--jobs', metavar='N', type=int, default=1,
+                        help='generate sections in N worker processes')
+    parser.add_argument('-m', '--mmap', action='store_true',
+                        help='preallocate the output files and write them '
+                        'through mmap (requires --output)')
+    parser.add_argument('-n', '--numpy', action='store_true',
+                        help='expand operand blocks with numpy')
+    parser.add_argument('-c', '--count', action='store_true',
+                        help='only print the number of instructions and bytes '
+                        'of every section')
+    parser.add_argument('-d', '--dedup', action='store_true',
+                        help='drop the forms only differing from others in '
+                        'prefixes that do not change their decoding, '
+                        'reporting the shrink to stderr')
+    parser.add_argument('-r', '--reduce', action='store_true',
+                        help='emit one ModRM/SIB operand of every length '
+                        'class instead of all of them, reporting the shrink '
+                        'to stderr')
+    parser.add_argument('-s', '--sample', metavar='N', type=int,
+                        help='emit a random sample of N instructions, '
+                        'stratified by section and form')
+    parser.add_argument('-S', '--seed', metavar='S', type=int, default=0,
+                        help='random seed of --sample (default: 0)')
+    args = parser.parse_args()
+
+    if args.sample is not None and args.sample < 0:
+        parser.error('--sample must not be negative')
+    for stage, enabled in (('dedup', args.dedup), ('reduce', args.reduce),
+                           ('sample', args.sample is not None)):
+        if not enabled:
+            continue
+        before = totals()
+        _stages(stage == 'dedup', stage == 'reduce',
+                args.sample if stage == 'sample' else None, args.seed)
+        for name, b, a in zip(('forms', 'instructions', 'bytes'),
+                              before, totals()):
+            print('%s: %10d of %10d %-12s kept (-%.1f%%)' % (
+                stage, a, b, name, 100.0 * (b - a) / b), file=sys.stderr)
+
+    if args.count:
+        entries = index()
+        print('%10s %10s  %s' % ('count', 'size', 'section'))
+        for e in entries:
+            print('%10d %10d  %s' % (e['count'], e['size'], e['name']))
+        print('%10d %10d  %s' % (
+            sum(e['count'] for e in entries),
+            sum(e['size'] for e in entries),
+            'total',
+        ))
+        return
+
+    if args.mmap and not args.output:
+        parser.error('--mmap requires --output')
+    if args.numpy and numpy is None:
+        parser.error('--numpy requires numpy')
+
+    def writer(path, size):
+        if path is None:
+            return Writer(sys.stdout.fileno(), args.buffer_size)
+        if args.mmap:
+            flags = os.O_RDWR | os.O_CREAT | os.O_TRUNC
+            return MmapWriter(os.open(path, flags, 0o644), size())
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        return Writer(os.open(path, flags, 0o644), args.buffer_size)
+
+    out = writer(args.output, lambda: sum(s.size() for s in SECTIONS))
+    lengths = bitmap = None
+    if args.lengths:
+        lengths = writer(args.lengths, lambda: sum(len(s) for s in SECTIONS))
+    if args.bitmap:
+        bitmap = writer(args.bitmap,
+                        lambda: (sum(s.size() for s in SECTIONS) + 7) // 8)
+    carry = ''
+
+    if args.jobs > 1:
+        # forked workers inherit SECTIONS with the stages applied, the others
+        # build it afresh and have to apply them again
+        initializer, initargs = None, ()
+        if multiprocessing.get_start_method() != 'fork':
+            initializer, initargs = _stages, (
+                args.dedup, args.reduce, args.sample, args.seed)
+        pool = multiprocessing.Pool(args.jobs, initializer, initargs)
+        work = functools.partial(
+            render, lengths=bool(lengths or bitmap), vectorize=args.numpy
+        )
+        results = pool.imap(work, shards(args.jobs * 4))
+    else:
+        pool = None
+        results = (
+            render((i, i + 1), bool(lengths or bitmap), args.numpy)
+            for i in range(len(SECTIONS))
+        )
+
+    for result in results:
+        for data, lens in result:
+            out.write(data)
+            if lengths:
+                lengths.write(lens)
+            if bitmap:
+                bits, carry = x86bitmap.pack(lens, carry)
+                bitmap.write(bits)
+    if pool:
+        pool.close()
+        pool.join()
+    out.close()
+    if lengths:
+        lengths.close()
+    if bitmap:
+        bitmap.write(x86bitmap.flush(carry))
+        bitmap.close()
+
+    if args.index:
+        with open(args.index, 'w') as f:
+            f.write('[\n%s\n]\n' % ',\n'.join(json.dumps(e) for e in index()))
+
+
+if __name__ == '__main__':
+    main()
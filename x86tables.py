@@ -0,0 +1,294 @@
+#!/usr/bin/python3
+'''Derive the ld32 lookup tables from the x86gen instruction definitions.
+
+Every form of x86gen is one instruction shape: prefixes, opcode, optionally a
+ModRM Block (every operand Block of x86gen is a set of ModRM operands) and
+immediates. Taking one instruction of each form, the part of its length that
+ld32 explains without tables (prefixes, opcode, ModRM/SIB/displacement and the
+hard coded TEST, MEM67, DATA662 and OP3 checks) is subtracted, and whatever is
+left must be explained by the data1_t, data66_t, data2_t and data12_t bits of
+the opcode, with and without a 0x66 prefix. Opcodes x86gen does not emit keep
+the bits of the hand written tables of ld32.c.
+
+The tables are written as a C header, with the packed class_t of PACKED_T:
+
+    ./x86tables.py -o ld32_tables.h
+    cc -DLD32_TABLES -c ld32.c
+
+With --check the derived tables are only compared with those of ld32.c,
+exiting with status 1 if they differ.'''
+
+
+import argparse
+import collections
+import sys
+
+import ld32
+import x86gen
+
+
+# the tables of ld32.c, in order
+BITMAPS = ('prefix_t', 'modrm2_t', 'data12_t', 'modrm_t', 'data1_t',
+           'data2_t', 'data66_t')
+
+# the USE_T flag of each table
+FLAGS = {
+    'prefix_t': 'PREFIX_T',
+    'modrm2_t': 'MODRM2_T',
+    'data12_t': 'DATA12_T',
+    'modrm_t': 'MODRM_T',
+    'data1_t': 'DATA1_T',
+    'data2_t': 'DATA2_T',
+    'data66_t': 'DATA66_T',
+}
+
+# the class flag of prefixes, sharing the bit of CRDR which is only used in the
+# 0x0f map
+PREFIX = ld32.CRDR
+
+# (data1, data66, data2) bits of each immediate size, the 0x66 prefix
+# turning the 4 byte DATA66 immediates into 2 byte ones
+DATA = [(d1, d66, d2)
+        for d1 in (0, 1) for d66 in range(2 - d1) for d2 in (0, 1)]
+
+
+def immediate(data, ddef):
+    d1, d66, d2 = data
+    return d1 + d66 * ddef + d2 * 2
+
+
+def sample(form):
+    '''The first instruction of a form.'''
+    if form.block is x86gen.NONE:
+        return form.head + form.tail
+    operand = bytes(next(iter(form.block.generate())))
+    return form.head + operand + form.tail
+
+
+def decode(insn, modrm):
+    '''Split an instruction the way length_disasm() does.
+
+    Returns ((two byte map, opcode), ddef, the offset following the opcode,
+    the size of everything but the table driven immediates).'''
+    i = 0
+    ddef = mdef = 4
+    while insn[i] in x86gen.PREFIXES:
+        if insn[i] == 0x66:
+            ddef = 2
+        if insn[i] == 0x67:
+            mdef = 2
+        i += 1
+    two = insn[i] == 0x0f
+    i += two
+    op = insn[i]
+    i += 1
+    start = i
+    size = 0
+    crdr = False
+    if two:
+        if op & 0xf0 == 0x80:
+            size += ddef
+        crdr = op & 0xfc == 0x20
+        if op in (0x38, 0x3a):
+            i += 1
+    else:
+        if op in (0xf6, 0xf7) and not insn[i] & 0x30:
+            size += ddef if op & 1 else 1
+        if op & 0xfc == 0xa0:
+            size += mdef
+    if modrm:
+        mod, rm = insn[i] >> 6, insn[i] & 7
+        i += 1
+        if crdr:
+            mod = 3
+        if mod == 1:
+            size += 1
+        if mod == 2:
+            size += mdef
+        if mod != 3 and mdef == 2 and mod == 0 and rm == 6:
+            size += 2
+        if mod != 3 and mdef == 4 and rm == 4:
+            rm = insn[i] & 7
+            i += 1
+        if mod == 0 and mdef == 4 and rm == 5:
+            size += 4
+    return (two, op), ddef, start, i + size
+
+
+def opcodes():
+    '''The forms of every opcode, as {(two byte map, opcode): [(instruction,
+    ModRM Block, section name)]}.'''
+    forms = collections.defaultdict(list)
+    for section in x86gen.SECTIONS:
+        for form in section.forms:
+            insn = sample(form)
+            key, _, _, _ = decode(insn, False)
+            block = form.block is not x86gen.NONE
+            forms[key].append((insn, block, section.name))
+    return forms
+
+
+def takes_modrm(forms):
+    '''Whether the opcode of `forms` is followed by a ModRM byte: one of them
+    has a ModRM Block, or they spell out all 256 ModRM bytes (MOV CRn/DRn).'''
+    if any(block for _, block, _ in forms):
+        return True
+    following = set()
+    for insn, _, _ in forms:
+        _, _, start, _ = decode(insn, False)
+        following.add(insn[start:start + 1])
+    return len(following) == 0x100
+
+
+def derive():
+    '''Derive the tables.
+
+    Returns ({name: 256 bytes of 0 or 1}, {name: set of the opcodes taken
+    from x86gen}, [conflicts]).'''
+    tables = {name: bytearray(ld32.TABLES[name]) for name in BITMAPS}
+    derived = {name: set() for name in BITMAPS}
+    conflicts = []
+
+    tables['prefix_t'] = bytearray(0x100)
+    for p in x86gen.PREFIXES:
+        tables['prefix_t'][p] = 1
+    derived['prefix_t'] = set(range(0x100))
+
+    for (two, op), forms in sorted(opcodes().items()):
+        modrm = takes_modrm(forms)
+        sizes = set()
+        for insn, _, name in forms:
+            _, ddef, _, fixed = decode(insn, modrm)
+            sizes.add((ddef, len(insn) - fixed, name))
+        if two:
+            names = ('modrm2_t', 'data12_t')
+            choices = [(d1,) for d1 in (0, 1)
+                       if all(d1 == n for _, n, _ in sizes)]
+        else:
+            names = ('modrm_t', 'data1_t', 'data66_t', 'data2_t')
+            choices = [data for data in DATA
+                       if all(immediate(data, ddef) == n
+                              for ddef, n, _ in sizes)]
+        if len(choices) != 1:
+            conflicts.append(((two, op), sorted(sizes)))
+            continue
+        for name, bit in zip(names, (modrm,) + choices[0]):
+            tables[name][op] = bit
+            derived[name].add(op)
+    return ({name: bytes(t) for name, t in tables.items()}, derived,
+            conflicts)
+
+
+def packed(tables):
+    '''The class_t of PACKED_T: the flags of the one byte opcodes followed by
+    those of the 0x0f opcodes.'''
+    classes = bytearray(0x200)
+    for v in range(0x100):
+        classes[v] = (
+            ld32.MODRM * tables['modrm_t'][v] |
+            ld32.DATA1 * tables['data1_t'][v] |
+            ld32.DATA66 * tables['data66_t'][v] |
+            ld32.DATA2 * tables['data2_t'][v] |
+            ld32.TEST * (v in (0xf6, 0xf7)) |
+            ld32.MEM67 * ((v & 0xfc) == 0xa0) |
+            PREFIX * tables['prefix_t'][v]
+        )
+        classes[0x100 + v] = (
+            ld32.MODRM * tables['modrm2_t'][v] |
+            ld32.DATA1 * tables['data12_t'][v] |
+            ld32.DATA66 * ((v & 0xf0) == 0x80) |
+            ld32.CRDR * ((v & 0xfc) == 0x20) |
+            ld32.OP3 * (v in (0x38, 0x3a))
+        )
+    return bytes(classes)
+
+
+def bitmask32(name, bits):
+    lines = ['static const unsigned int %s[] = {' % name,
+             '           /* 0 1 2 3 4 5 6 7  8 9 a b c d e f */']
+    for row in range(0, 0x100, 0x20):
+        half = []
+        for r in (row, row + 0x10):
+            b = bits[r:r + 0x10]
+            half.append(','.join(map(str, b[:8])) + ', ' +
+                        ','.join(map(str, b[8:])))
+        end = '),' if row < 0xe0 else ') '
+        lines.append('    BITMASK32(%s,  /* %x */' % (half[0], row >> 4))
+        lines.append('              %s%s /* %x */' % (half[1], end,
+                                                     (row >> 4) + 1))
+    lines.append('};')
+    return '\n'.join(lines)
+
+
+def class_table(classes):
+    lines = ['static const unsigned char class_t[] = {',
+             '    /* 0     1     2     3     4     5     6     7 */']
+    for row in range(0, 0x200, 8):
+        if row == 0x100:
+            lines.append('    /* 0f map */')
+        end = ',' if row < 0x1f8 else ' '
+        lines.append('    %s%s /* %02x */' % (
+            ', '.join('0x%02x' % c for c in classes[row:row + 8]), end,
+            row & 0xff))
+    lines.append('};')
+    return '\n'.join(lines)
+
+
+def header(tables):
+    '''The C header defining every table of ld32.c.'''
+    out = ['/* ld32 lookup tables generated by x86tables.py from x86gen.py,',
+           ' * do not edit */', '']
+    for name in BITMAPS:
+        out.append('#if defined(USE_T) && (USE_T & %s) && '
+                   '!(USE_T & PACKED_T)' % FLAGS[name])
+        out.append(bitmask32(name, tables[name]))
+        out.append('#endif')
+        out.append('')
+    out.append('#if defined(USE_T) && (USE_T & PACKED_T)')
+    out.append(class_table(packed(tables)))
+    out.append('#endif')
+    return '\n'.join(out) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='write the header to FILE instead of stdout')
+    parser.add_argument('-c', '--check', action='store_true',
+                        help='only compare the tables with those of ld32.c')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='list the opcodes kept from ld32.c')
+    args = parser.parse_args()
+
+    tables, derived, conflicts = derive()
+    for (two, op), sizes in conflicts:
+        print('%s%02x: no table bits give the immediate sizes %s' % (
+            '0f ' if two else '', op, ', '.join(
+                '%d (ddef %d, %s)' % (n, ddef, name)
+                for ddef, n, name in sizes)), file=sys.stderr)
+
+    differences = 0
+    for name in BITMAPS:
+        kept = [v for v in range(0x100) if v not in derived[name]]
+        changed = [v for v in range(0x100)
+                   if tables[name][v] != ld32.TABLES[name][v]]
+        differences += len(changed)
+        print('%-9s %3d opcodes derived, %3d kept, %3d differ from ld32.c%s'
+              % (name, 0x100 - len(kept), len(kept), len(changed),
+                 ''.join(' %02x' % v for v in changed)), file=sys.stderr)
+        if args.verbose and kept:
+            print('          kept:%s' % ''.join(' %02x' % v for v in kept),
+                  file=sys.stderr)
+
+    if args.check:
+        sys.exit(1 if differences or conflicts else 0)
+    text = header(tables)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == '__main__':
+    main()